@@ -0,0 +1,9 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from allowance.models import Allowance
+from utility.rule_cache import invalidate_rule_cache
+
+# drop the cached compensation rules whenever an allowance changes
+@receiver([post_save, post_delete], sender=Allowance)
+def invalidate_allowance_rules(sender, **kwargs):
+    invalidate_rule_cache()
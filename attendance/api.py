@@ -2,30 +2,37 @@
 # ATTENDANCE API
 # ===============================================================
 # import the necessary modules
-from datetime import datetime
+from datetime import datetime, date
 import uuid
-from ninja import Router
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from ninja import Router, File
+from ninja.files import UploadedFile
 
 # ===============================
 # MODELS
 # ===============================
-from .models import Attendance
+from .models import Attendance, AttendanceMonthlySummary
 from employees.models import Employee
 
 # ===============================
 # SCHEMAS
 # ===============================
-from .schemas import AttendanceResponse, AttendanceCheckInIn, AttendanceCheckOutIn, status
+from .schemas import AttendanceResponse, AttendanceCheckInIn, AttendanceCheckOutIn, AttendanceBulkCheckInIn, AttendanceBulkResponse, AttendanceImportResponse, AttendanceSummaryResponse
 
 # ===============================
 # SERIALIZERS
 # ===============================
-from .serializer import serialize_attendance_list, serialize_attendance_single
+from .serializer import serialize_attendance, serialize_attendance_list, serialize_attendance_single, serialize_attendance_summary_list
 
 # ===============================
 # UTILS
 # ===============================
 from utility.attendance import check_in_status, check_out_status
+from utility.attendance_bulk import bulk_check_in, insert_attendances, new_check_in
+from utility.attendance_import import get_import_format, import_attendance_log
+from utility.attendance_summary import get_summary_month, record_check_ins, record_check_out
+from utility.streaming import stream_ndjson, STREAM_FORMATS
 
 # ====================
 # ROUTER
@@ -50,26 +57,152 @@ attendance_router = Router(tags=["Attendance"])
 @attendance_router.get(
     "/",
     response=AttendanceResponse,
-    description="Get all attendance records",
+    description="Get all attendance records. Pass stream=ndjson to stream one record per line instead.",
     url_name="list_attendance"
 )
-def list_attendance(request):
+def list_attendance(request, stream: str = None):
     """
     Get all attendance records.
 
     Args:
         request: The request object.
+        stream: 'ndjson' to stream the records as newline delimited JSON.
 
     Returns:
         The response object.
     """
     try:
-        attendance = Attendance.objects.select_related("employee_id").all()
+        attendance = Attendance.objects.select_related("employee_id", "employee_id__work_location").all()
+        if stream in STREAM_FORMATS:
+            return stream_ndjson(attendance, serialize_attendance)
         data = serialize_attendance_list(attendance)
         return AttendanceResponse(status_code=200, success=True, message="Attendance records fetched", data=data)
     except Exception as e:
         return AttendanceResponse(status_code=500, success=False, message=str(e), data=[])
 
+# =====================================================================
+# Endpoint: Bulk Create Attendance
+# ---------------------------------------------------------------------
+# This API endpoint records the check-ins buffered by badge terminals and 
+# kiosks in one request. The employees are loaded with one query and the 
+# new records are inserted with a single insert that skips the employees already checked 
+# in today, so a burst of thousands of check-ins costs two queries.
+# The endpoint is registered at the '/bulk' path of the attendance router and returns a response conforming to the AttendanceBulkResponse.
+# On success, it returns one result per check-in, in request order, with the 
+# created attendance id or the reason it was rejected; on failure, it returns an error message and an empty data list.
+# =====================================================================
+@attendance_router.post(
+    "/bulk",
+    response=AttendanceBulkResponse,
+    description="Create the attendance records of many check-ins. Returns one result per check-in.",
+    summary="Bulk create attendance records",
+)
+def bulk_create_attendance(request, payload: AttendanceBulkCheckInIn):
+    """
+    Create the attendance records of many check-ins.
+
+    Args:
+        request: The request object.
+        payload: The payload object.
+
+    Returns:
+        The response object.
+    """
+    try:
+        today = datetime.now().date()
+        results, created = bulk_check_in(payload.check_ins, today)
+        message = f"{created} attendance records created, {len(results) - created} rejected"
+        return AttendanceBulkResponse(status_code=200, success=True, message=message, created=created, data=results)
+    except Exception as e:
+        return AttendanceBulkResponse(status_code=500, success=False, message=str(e), created=0, data=[])
+
+
+# =====================================================================
+# Endpoint: Import Attendance Log
+# ---------------------------------------------------------------------
+# This API endpoint imports the daily punch log exported by a biometric 
+# device, as a CSV file (with an employee_code and a timestamp, or date 
+# and time, column) or an NDJSON file with the same keys. The file is 
+# parsed as a stream, its rows are validated against the employee codes 
+# and loaded in bulk into the attendance_punches staging table, then 
+# merged into the attendances: the first punch of an employee on a day 
+# is the check-in and the last one the check-out.
+# The endpoint is registered at the '/import' path of the attendance router and returns a response conforming to the AttendanceImportResponse.
+# On success, it returns the import report with the first rejected rows 
+# and the reason of each; on failure, it returns an error message and an empty data list.
+# =====================================================================
+@attendance_router.post(
+    "/import",
+    response=AttendanceImportResponse,
+    description="Import a biometric device punch log (csv or ndjson). Returns the import report with the rejected rows.",
+    summary="Import attendance punch log",
+)
+def import_attendance(request, file: UploadedFile = File(...), format: str = None):
+    """
+    Import a biometric device punch log.
+
+    Args:
+        request: The request object.
+        file: The uploaded log file.
+        format: 'csv' or 'ndjson', taken from the file extension by default.
+
+    Returns:
+        The response object.
+    """
+    try:
+        report = import_attendance_log(file.file, get_import_format(file.name, format))
+        message = f"{report['attendances']} attendance records imported, {report['rejected']} rows rejected"
+        return AttendanceImportResponse(status_code=200, success=True, message=message, data=[report])
+    except ValueError as e:
+        return AttendanceImportResponse(status_code=400, success=False, message=str(e), data=[])
+    except Exception as e:
+        return AttendanceImportResponse(status_code=500, success=False, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Get Monthly Attendance Summary
+# ---------------------------------------------------------------------
+# This API endpoint returns the attendance summary of every employee for 
+# a month: days present, late check-ins, early check-outs and hours 
+# worked. The summaries are kept up to date on every check-in and 
+# check-out, so the report is read from one precomputed row per employee 
+# instead of the attendance records of the month.
+# The endpoint is registered at the '/summary' path of the attendance router and returns a response conforming to the AttendanceSummaryResponse.
+# On success, it returns the summaries, optionally filtered by department 
+# and branch; on failure, it returns an error message and an empty data list.
+# =====================================================================
+@attendance_router.get(
+    "/summary",
+    response=AttendanceSummaryResponse,
+    description="Get the monthly attendance summary of the employees. Filter by department_id and work_location_id.",
+    summary="Get monthly attendance summary",
+)
+def get_attendance_summary(request, month: date = None, department_id: uuid.UUID = None, work_location_id: uuid.UUID = None):
+    """
+    Get the monthly attendance summary of the employees.
+
+    Args:
+        request: The request object.
+        month: Any day of the month, defaults to the current month.
+        department_id: Only the employees of this department.
+        work_location_id: Only the employees of this branch.
+
+    Returns:
+        The response object.
+    """
+    try:
+        summaries = AttendanceMonthlySummary.objects.select_related(
+            "employee", "employee__department", "employee__work_location"
+        ).filter(month=get_summary_month(month or datetime.now().date()))
+        if department_id:
+            summaries = summaries.filter(employee__department_id=department_id)
+        if work_location_id:
+            summaries = summaries.filter(employee__work_location_id=work_location_id)
+
+        data = serialize_attendance_summary_list(summaries.order_by("employee__full_name", "employee_id"))
+        return AttendanceSummaryResponse(status_code=200, success=True, message="Attendance summary fetched", data=data)
+    except Exception as e:
+        return AttendanceSummaryResponse(status_code=500, success=False, message=str(e), data=[])
+
 # =====================================================================
 # Endpoint: Get Attendance by ID
 # ---------------------------------------------------------------------
@@ -110,7 +243,10 @@ def get_attendance(request, attendance_id: uuid.UUID):
 # Endpoint: Create Attendance
 # ---------------------------------------------------------------------
 # This API endpoint creates a new attendance record in the database. 
-# It uses the Attendance model to create the record.
+# It uses the Attendance model to create the record with a single 
+# INSERT ... ON CONFLICT DO NOTHING RETURNING: an employee that already 
+# checked in today is reported from the insert result, so two concurrent 
+# check-ins of the same employee cannot both be recorded.
 # The endpoint is registered at the '/' path of the attendance router and returns a response conforming to the AttendanceResponseSchema.
 # On success, it returns the attendance record with its details; on failure, it returns an error message and an empty data list.
 # This endpoint is useful for administrative interfaces or dashboards 
@@ -135,22 +271,18 @@ def create_attendance(request, payload: AttendanceCheckInIn):
     """
     try:
         today = datetime.now().date()
-        employee = Employee.objects.get(id=payload.employee_id)
-        is_exists = Attendance.objects.filter(employee_id=employee, attendance_date=today).exists()
-        if is_exists:
-            return AttendanceResponse(status_code=400, success=False, message="Attendance record already exists", data=[])
-        status.update(check_in_status(payload.check_in_time))
-
-        attendance = Attendance.objects.create(
-            employee_id_id=payload.employee_id,
-            attendance_date=today,
-            check_in_time=payload.check_in_time,
-            check_out_time=None,
-            status=status,
-        )
+        attendance = new_check_in(payload.employee_id, today, payload.check_in_time)
+        with transaction.atomic():
+            # the insert itself tells whether the employee already checked in today
+            if not insert_attendances([attendance]):
+                return AttendanceResponse(status_code=400, success=False, message="Attendance record already exists", data=[])
+            record_check_ins([attendance])
+
+        attendance = Attendance.objects.select_related("employee_id", "employee_id__work_location").get(id=attendance.id)
         data = serialize_attendance_single(attendance)
         return AttendanceResponse(status_code=200, success=True, message="Attendance record created", data=[data])
-    except Employee.DoesNotExist:
+    except IntegrityError:
+        # the only other constraint of the insert is the employee foreign key
         return AttendanceResponse(status_code=404, success=False, message="Employee not found", data=[])
     except Exception as e:
         return AttendanceResponse(status_code=500, success=False, message=str(e), data=[])
@@ -193,12 +325,22 @@ def update_attendance(request, attendance_id: uuid.UUID, payload: AttendanceChec
         if attendance.check_out_time is not None:
             return AttendanceResponse(status_code=400, success=False, message="Attendance record already checked out", data=[])
 
-        status.update(check_out_status(payload.check_out_time))
-
+        flags = check_out_status(payload.check_out_time)
         attendance.check_out_time = payload.check_out_time
-        attendance.status = status
+        attendance.early_out = flags["early_out"]
+        attendance.on_time_out = flags["on_time_out"]
+
+        with transaction.atomic():
+            # only the first of concurrent check-outs updates the record
+            updated = Attendance.objects.filter(id=attendance.id, check_out_time__isnull=True).update(
+                check_out_time=attendance.check_out_time,
+                **flags,
+                updated_at=timezone.now(),
+            )
+            if not updated:
+                return AttendanceResponse(status_code=400, success=False, message="Attendance record already checked out", data=[])
+            record_check_out(attendance)
 
-        attendance.save()
         data = serialize_attendance_single(attendance)
         return AttendanceResponse(status_code=200, success=True, message="Attendance record updated", data=[data])
     except Attendance.DoesNotExist:
@@ -238,6 +380,8 @@ def delete_attendance(request):
         attendance = Attendance.objects.all()
         for attendance in attendance:
             attendance.delete()
+        # the monthly summaries are computed from the deleted records
+        AttendanceMonthlySummary.objects.all().delete()
         return AttendanceResponse(status_code=200, success=True, message="Attendance record deleted", data=[])
     except Exception as e:
         return AttendanceResponse(status_code=500, success=False, message=str(e), data=[])
\ No newline at end of file
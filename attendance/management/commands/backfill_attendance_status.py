@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from attendance.models import Attendance
+from utility.attendance import check_in_status, check_out_status
+from utility.attendance_summary import rebuild_attendance_summaries
+
+# rows updated per bulk_update
+BACKFILL_CHUNK_SIZE = 2000
+
+# flags of the legacy status JSON stored as columns
+STATUS_COLUMNS = ["late_in", "on_time_in", "early_out", "on_time_out"]
+
+class Command(BaseCommand):
+    help = "Compute the check-in/check-out status columns of the existing attendances from their times"
+
+    def handle(self, *args, **kwargs):
+        # the legacy status JSON is not read: it was built from a dict shared
+        # between requests and with the check-out test inverted, the flags
+        # are recomputed from the times of every record instead
+        updated = 0
+        with transaction.atomic():
+            chunk = []
+            for attendance in Attendance.objects.only("id", "check_in_time", "check_out_time").order_by("id").iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+                flags = dict.fromkeys(STATUS_COLUMNS, False)
+                if attendance.check_in_time is not None:
+                    flags.update(check_in_status(attendance.check_in_time))
+                    if attendance.check_out_time is not None:
+                        flags.update(check_out_status(attendance.check_out_time))
+                for column, value in flags.items():
+                    setattr(attendance, column, value)
+                chunk.append(attendance)
+                if len(chunk) >= BACKFILL_CHUNK_SIZE:
+                    updated += Attendance.objects.bulk_update(chunk, STATUS_COLUMNS)
+                    chunk = []
+            if chunk:
+                updated += Attendance.objects.bulk_update(chunk, STATUS_COLUMNS)
+
+            months = Attendance.objects.dates("attendance_date", "month")
+            written = sum(rebuild_attendance_summaries(month) for month in months)
+        self.stdout.write(f"{updated} attendance records backfilled")
+        self.stdout.write(self.style.SUCCESS(f"{written} attendance summary rows rebuilt"))
@@ -0,0 +1,47 @@
+import csv
+import json
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utility.attendance_import import IMPORT_FORMATS, get_import_format, import_attendance_log
+
+class Command(BaseCommand):
+    help = "Import biometric device punch logs (csv or ndjson) into the attendances"
+
+    def add_arguments(self, parser):
+        parser.add_argument("files", nargs="+", help="The log files to import")
+        parser.add_argument("--format", choices=IMPORT_FORMATS, default=None, help="The log format, taken from the file extension by default")
+        parser.add_argument("--report", default=None, help="Write the rejected rows of every file to this CSV file")
+
+    def handle(self, *args, **kwargs):
+        formats = {}
+        for path in kwargs["files"]:
+            try:
+                formats[path] = get_import_format(path, kwargs["format"])
+            except ValueError as e:
+                raise CommandError(str(e))
+
+        with ExitStack() as stack:
+            writer = None
+            if kwargs["report"]:
+                writer = csv.writer(stack.enter_context(open(kwargs["report"], "w", newline="")))
+                writer.writerow(["file", "line", "reason", "record"])
+
+            rejected = 0
+            for path, format in formats.items():
+                # the rejected rows are written as they are read, not kept
+                def write_rejected(row, path=path):
+                    writer.writerow([path, row["line"], row["reason"], json.dumps(row["record"], default=str)])
+
+                with open(path, "rb") as stream:
+                    report = import_attendance_log(stream, format, report_limit=0, on_reject=write_rejected if writer else None)
+                rejected += report["rejected"]
+                self.stdout.write(
+                    f"{path}: {report['rows']} rows, {report['punches']} punches, "
+                    f"{report['attendances']} attendances, {report['rejected']} rejected"
+                )
+
+        if kwargs["report"]:
+            self.stdout.write(f"{rejected} rejected rows written to {kwargs['report']}")
+        self.stdout.write(self.style.SUCCESS(f"{len(kwargs['files'])} attendance logs imported"))
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from attendance.models import Attendance
+from utility.attendance_summary import rebuild_attendance_summaries
+
+class Command(BaseCommand):
+    help = "Recompute the monthly attendance summaries from the attendances"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--month", type=date.fromisoformat, default=None, help="Only rebuild the month of this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **kwargs):
+        months = [kwargs["month"]] if kwargs["month"] else Attendance.objects.dates("attendance_date", "month")
+        written = sum(rebuild_attendance_summaries(month) for month in months)
+        self.stdout.write(self.style.SUCCESS(f"{written} attendance summary rows rebuilt"))
@@ -20,7 +20,15 @@ class Attendance(models.Model):
     attendance_date = models.DateField(verbose_name="Attendance Date",null=False,blank=False)
 
     # Status Information
-    status = models.JSONField(default=dict, verbose_name="Attendance Status",null=False,blank=False)
+    late_in = models.BooleanField(default=False, verbose_name="Late Check In")
+    on_time_in = models.BooleanField(default=False, verbose_name="On Time Check In")
+    early_out = models.BooleanField(default=False, verbose_name="Early Check Out")
+    on_time_out = models.BooleanField(default=False, verbose_name="On Time Check Out")
+
+    # Legacy status JSON, no longer written or read: kept until the
+    # columns above are computed for the existing records with the
+    # backfill_attendance_status command
+    status = models.JSONField(default=dict, verbose_name="Legacy Attendance Status", null=False, blank=True)
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True,verbose_name="Created At")
@@ -31,6 +39,87 @@ class Attendance(models.Model):
         verbose_name = "Attendance"
         verbose_name_plural = "Attendances"
         db_table = "attendances"
+        constraints = [
+            # one attendance per employee and day, its index also serves the
+            # lookups of an employee's attendance on a day
+            models.UniqueConstraint(fields=["employee_id", "attendance_date"], name="unique_attendance_employee_date"),
+        ]
+        indexes = [
+            # late and early-out days are a small share of the table, the
+            # partial indexes only hold those rows
+            models.Index(fields=["attendance_date"], condition=models.Q(late_in=True), name="attendance_late_in_idx"),
+            models.Index(fields=["attendance_date"], condition=models.Q(early_out=True), name="attendance_early_out_idx"),
+        ]
 
     def __str__(self):
         return f"{self.employee_id.full_name} - {self.attendance_date}"
+
+# ===============================
+# ATTENDANCE PUNCH MODEL
+# ===============================
+# Staging table of the device log imports: the punches of an import batch
+# are loaded here in bulk and merged into the attendances, see
+# utility/attendance_import.py.
+class AttendancePunch(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Punch Information
+    batch_id = models.UUIDField(verbose_name="Import Batch", null=False, blank=False)
+    employee = models.ForeignKey('employees.Employee', on_delete=models.CASCADE, verbose_name="Employee", null=False, blank=False, related_name="attendance_punches")
+    punch_date = models.DateField(verbose_name="Punch Date", null=False, blank=False)
+    punch_time = models.TimeField(verbose_name="Punch Time", null=False, blank=False)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        ordering = ["punch_date", "punch_time"]
+        verbose_name = "Attendance Punch"
+        verbose_name_plural = "Attendance Punches"
+        db_table = "attendance_punches"
+        indexes = [
+            models.Index(fields=["batch_id", "employee", "punch_date"], name="attendance_punch_batch_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.punch_date} {self.punch_time}"
+
+# ===============================
+# ATTENDANCE MONTHLY SUMMARY MODEL
+# ===============================
+# Attendance counts of an employee per month, updated on every check-in
+# and check-out and rebuildable from the attendances, see
+# utility/attendance_summary.py.
+class AttendanceMonthlySummary(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Summary Key
+    employee = models.ForeignKey('employees.Employee', on_delete=models.CASCADE, verbose_name="Employee", null=False, blank=False, related_name="attendance_summaries")
+    month = models.DateField(verbose_name="Month (first day of the month)", null=False, blank=False)
+
+    # Counts
+    days_present = models.PositiveIntegerField(default=0, verbose_name="Days Present")
+    late_in_count = models.PositiveIntegerField(default=0, verbose_name="Late Check-ins")
+    on_time_in_count = models.PositiveIntegerField(default=0, verbose_name="On Time Check-ins")
+    early_out_count = models.PositiveIntegerField(default=0, verbose_name="Early Check-outs")
+    on_time_out_count = models.PositiveIntegerField(default=0, verbose_name="On Time Check-outs")
+    seconds_worked = models.PositiveIntegerField(default=0, verbose_name="Seconds Worked")
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        ordering = ["-month"]
+        verbose_name = "Attendance Monthly Summary"
+        verbose_name_plural = "Attendance Monthly Summaries"
+        db_table = "attendance_monthly_summaries"
+        constraints = [
+            models.UniqueConstraint(fields=["employee", "month"], name="unique_attendance_summary_employee_month"),
+        ]
+        indexes = [
+            models.Index(fields=["month"], name="attendance_summary_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.month}"
@@ -5,6 +5,7 @@ from ninja import Schema, Field
 from typing import List, Optional
 import uuid
 from datetime import datetime, date, time
+from types import MappingProxyType
 
 # ========================
 # EMPLOYEE SCHEMA
@@ -17,7 +18,9 @@ class EmployeeSchema(Schema):
 # ===============================
 # ATTENDANCE STATUS
 # ===============================
-status = {
+# read-only defaults of the status dict of an attendance response, the
+# check-in and check-out flags are filled from the columns of the record
+STATUS_FLAGS = MappingProxyType({
     # check-in status
     "late_in": False,
     "on_time_in": False,
@@ -35,7 +38,7 @@ status = {
     "permission": False,
     "overtime": False,
     "other": False
-}
+})
 
 # ===============================
 # ATTENDANCE SCHEMA
@@ -45,6 +48,10 @@ class AttendanceCheckInIn(Schema):
     employee_id: uuid.UUID
     check_in_time: time = Field(..., description="Check-in timestamp")
    
+# bulk check in schema
+class AttendanceBulkCheckInIn(Schema):
+    check_ins: List[AttendanceCheckInIn] = Field(..., min_length=1, max_length=5000, description="The check-ins buffered by a terminal")
+
 # check out schema
 class AttendanceCheckOutIn(Schema):
     employee_id: uuid.UUID
@@ -67,3 +74,61 @@ class AttendanceResponse(Schema):
     message: str
     data: List[AttendanceDataSchema]
 
+
+# bulk check in result schema
+class AttendanceBulkResultSchema(Schema):
+    employee_id: uuid.UUID = Field(..., description="The employee of the check-in")
+    success: bool = Field(..., description="Whether the check-in was recorded")
+    message: str = Field(..., description="The outcome of the check-in")
+    attendance_id: uuid.UUID | None = Field(None, description="The id of the created attendance record")
+
+# bulk check in response schema
+class AttendanceBulkResponse(Schema):
+    status_code: int
+    success: bool
+    message: str
+    created: int = Field(0, description="The number of attendance records created")
+    data: List[AttendanceBulkResultSchema]
+
+# rejected log row schema
+class AttendanceRejectedRowSchema(Schema):
+    line: int = Field(..., description="The line of the rejected row in the log file")
+    reason: str = Field(..., description="Why the row was rejected")
+    record: dict = Field(..., description="The rejected row as read from the file")
+
+# log import report schema
+class AttendanceImportReportSchema(Schema):
+    batch_id: uuid.UUID = Field(..., description="The id of the import batch")
+    rows: int = Field(..., description="The number of rows read from the file")
+    punches: int = Field(..., description="The number of valid punches loaded")
+    rejected: int = Field(..., description="The number of rejected rows")
+    attendances: int = Field(..., description="The number of attendance records created or updated")
+    rejected_rows: List[AttendanceRejectedRowSchema] = Field(..., description="The first rejected rows with their reason")
+
+# log import response schema
+class AttendanceImportResponse(Schema):
+    status_code: int
+    success: bool
+    message: str
+    data: List[AttendanceImportReportSchema]
+
+# monthly summary schema
+class AttendanceSummarySchema(Schema):
+    employee_id: uuid.UUID = Field(..., description="The id of the employee")
+    full_name: str = Field(..., description="The full name of the employee")
+    department: str | None = Field(None, description="The department of the employee")
+    work_location: str | None = Field(None, description="The branch of the employee")
+    month: date = Field(..., description="The first day of the month")
+    days_present: int = Field(..., description="The number of days checked in")
+    late_in_count: int = Field(..., description="The number of late check-ins")
+    on_time_in_count: int = Field(..., description="The number of on time check-ins")
+    early_out_count: int = Field(..., description="The number of early check-outs")
+    on_time_out_count: int = Field(..., description="The number of on time check-outs")
+    hours_worked: float = Field(..., description="The hours worked between check-in and check-out")
+
+# monthly summary response schema
+class AttendanceSummaryResponse(Schema):
+    status_code: int
+    success: bool
+    message: str
+    data: List[AttendanceSummarySchema]
@@ -1,10 +1,11 @@
 # ===============================================================
 # ATTENDANCE SERIALIZER
 # ===============================================================
-from .models import Attendance
-from .schemas import AttendanceDataSchema, EmployeeSchema
+from .models import Attendance, AttendanceMonthlySummary
+from .schemas import AttendanceDataSchema, EmployeeSchema, AttendanceSummarySchema
 from employees.models import Employee
 from typing import List
+from utility.attendance import get_attendance_status
 
 
 # ===============================
@@ -27,7 +28,7 @@ def serialize_attendance(attendance: Attendance):
         attendance_date=attendance.attendance_date,
         check_in_time=attendance.check_in_time,
         check_out_time=attendance.check_out_time,
-        status=attendance.status,
+        status=get_attendance_status(attendance),
     )
 
 # ===============================
@@ -39,4 +40,27 @@ def serialize_attendance_single(attendance: Attendance):
 
 # serialize list of attendances
 def serialize_attendance_list(attendances: List[Attendance]):
-    return [serialize_attendance(attendance) for attendance in attendances]
\ No newline at end of file
+    return [serialize_attendance(attendance) for attendance in attendances]
+
+# ===============================
+# SERIALIZER FOR ATTENDANCE MONTHLY SUMMARY
+# ===============================
+def serialize_attendance_summary(summary: AttendanceMonthlySummary):
+    employee = summary.employee
+    return AttendanceSummarySchema(
+        employee_id=employee.id,
+        full_name=employee.full_name,
+        department=employee.department.dep_name if employee.department else None,
+        work_location=employee.work_location.branch_name if employee.work_location else None,
+        month=summary.month,
+        days_present=summary.days_present,
+        late_in_count=summary.late_in_count,
+        on_time_in_count=summary.on_time_in_count,
+        early_out_count=summary.early_out_count,
+        on_time_out_count=summary.on_time_out_count,
+        hours_worked=round(summary.seconds_worked / 3600, 2),
+    )
+
+# serialize list of monthly summaries
+def serialize_attendance_summary_list(summaries: List[AttendanceMonthlySummary]):
+    return [serialize_attendance_summary(summary) for summary in summaries]
@@ -0,0 +1,167 @@
+# ===============================================================
+# PAYROLL BENCHMARKS
+# ===============================================================
+# Usage:
+#     python -m benchmarks --sizes 1000 10000 100000 --output results.json
+#
+# For every size a fresh synthetic workforce is generated, then the full
+# payroll run, the per employee calculation and the list serializers are
+# timed. Every result records the wall time, the number of SQL queries and
+# the peak Python memory (tracemalloc, disabled with --no-memory since it
+# slows the code down). Results are written as JSON to compare releases.
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from emp_payroll.models import Payroll, PayrollRun  # noqa: E402
+from emp_payroll.serializer import serialize_payroll_list  # noqa: E402
+from employees.models import Employee  # noqa: E402
+from employees.serializers import serialize_employee_list  # noqa: E402
+from utility.payroll import get_allowances, get_deductions  # noqa: E402
+from utility.payroll_engine import count_queries, execute_payroll_run, run_payroll  # noqa: E402
+from utility.payroll_vector import compute_workforce, load_workforce  # noqa: E402
+from utility.payroll import load_rule_set  # noqa: E402
+from utility.rule_cache import invalidate_rule_cache  # noqa: E402
+
+from benchmarks.workforce import generate_workforce  # noqa: E402
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+PAYMENT_DATE = date(2025, 1, 31)
+
+# ===============================
+# MEASUREMENT
+# ===============================
+def measure(name: str, size: int, function, trace_memory: bool = True):
+    """
+    Run a benchmark once and collect its time, queries and peak memory.
+
+    Returns:
+        dict: The result of the benchmark.
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    with count_queries() as counter:
+        started = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - started
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return {
+        "benchmark": name,
+        "size": size,
+        "seconds": round(elapsed, 4),
+        "per_employee_us": round(elapsed / size * 1_000_000, 2) if size else None,
+        "queries": counter["queries"],
+        "peak_memory_kb": round(peak / 1024, 1) if peak is not None else None,
+    }
+
+# ===============================
+# BENCHMARKS
+# ===============================
+def reset_database():
+    call_command("flush", interactive=False, verbosity=0)
+    invalidate_rule_cache()
+
+def per_employee_calculation():
+    for salary, allowance, deduction in Employee.objects.values_list("basic_salary", "allowance", "deduction").iterator(chunk_size=5000):
+        get_allowances(allowance, salary)
+        get_deductions(deduction, salary)
+
+def vector_calculation():
+    compute_workforce(load_workforce(), load_rule_set())
+
+def payroll_run_job():
+    run = PayrollRun.objects.create(payment_date=PAYMENT_DATE, pay_period=PAYMENT_DATE.replace(day=1))
+    execute_payroll_run(run.id)
+
+def serialize_payrolls():
+    serialize_payroll_list(Payroll.objects.select_related("employee_id", "employee_id__department", "employee_id__department__manager"))
+
+def serialize_employees():
+    serialize_employee_list(Employee.objects.select_related("department", "department__manager", "work_location"))
+
+BENCHMARKS = [
+    # first run of a month: every payroll is inserted
+    ("payroll_run", lambda: run_payroll(PAYMENT_DATE)),
+    # re-run of the same month: every payroll is compared and left unchanged
+    ("payroll_rerun", lambda: run_payroll(PAYMENT_DATE)),
+    ("payroll_rerun_incremental", lambda: run_payroll(PAYMENT_DATE, incremental=True)),
+    ("payroll_run_job", payroll_run_job),
+    ("per_employee_calculation", per_employee_calculation),
+    ("vector_calculation", vector_calculation),
+    ("serialize_payroll_list", serialize_payrolls),
+    ("serialize_employee_list", serialize_employees),
+]
+
+def run_size(size: int, seed: int, trace_memory: bool, selected: list):
+    reset_database()
+    started = time.perf_counter()
+    generated = generate_workforce(size, seed)
+    results = [{"benchmark": "generate_workforce", "size": size, "seconds": round(time.perf_counter() - started, 4), **{"generated": generated}}]
+    for name, function in BENCHMARKS:
+        if selected and name not in selected:
+            continue
+        results.append(measure(name, size, function, trace_memory))
+        print(f"{name:<28} {size:>8} {results[-1]['seconds']:>10.3f}s {results[-1]['queries']:>8} queries", file=sys.stderr)
+    return results
+
+def get_metadata(seed: int):
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "platform": platform.platform(),
+        "seed": seed,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the payroll on synthetic workforces")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Workforce sizes to benchmark")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the synthetic workforce")
+    parser.add_argument("--only", nargs="+", default=[], choices=[name for name, _ in BENCHMARKS], help="Only run these benchmarks")
+    parser.add_argument("--no-memory", action="store_true", help="Do not trace the peak memory")
+    parser.add_argument("--output", default=None, help="Write the JSON results to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+    report = {"metadata": get_metadata(args.seed), "results": []}
+    for size in args.sizes:
+        report["results"].extend(run_size(size, args.seed, not args.no_memory, args.only))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# ===============================================================
+# BENCHMARK SETTINGS
+# ===============================================================
+# The project settings with a throwaway database: SQLite by default, or
+# the PostgreSQL database of the DB_* variables with
+# BENCHMARK_DATABASE=postgres. Tables are created straight from the models.
+import os
+import tempfile
+
+# the project settings read these through decouple
+for variable in ("DB_NAME", "DB_HOST", "DB_USER", "DB_PASSWORD", "DB_PORT"):
+    os.environ.setdefault(variable, "")
+
+from hr_system.settings import *  # noqa: E402,F401,F403
+from hr_system.settings import INSTALLED_APPS, DATABASES  # noqa: E402
+
+if os.environ.get("BENCHMARK_DATABASE", "sqlite") != "postgres":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("BENCHMARK_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "hr_system_benchmark.sqlite3")),
+        }
+    }
+
+# create the tables from the models instead of running migrations
+MIGRATION_MODULES = {app.split(".")[-1]: None for app in INSTALLED_APPS}
+
+DEBUG = False
@@ -0,0 +1,153 @@
+# ===============================================================
+# SYNTHETIC WORKFORCE
+# ===============================================================
+# Reproducible employees, allowances and Tax/Pension/Other rule sets. The
+# same seed and size always generate the same salaries and rule
+# assignments, so results of different releases can be compared.
+import random
+import uuid
+from datetime import date
+
+from allowance.models import Allowance
+from company_address.models import CompanyAddress
+from deduction.models import Deduction
+from department.models import Department
+from employees.models import Employee
+
+# rows written per bulk insert
+BULK_SIZE = 2000
+
+TAX_BRACKETS = [
+    (0, 600, 0, 0),
+    (601, 1650, 10, 60),
+    (1651, 3200, 15, 142.5),
+    (3201, 5250, 20, 302.5),
+    (5251, 7800, 25, 565),
+    (7801, 10900, 30, 955),
+    (10901, "UNLIMITED", 35, 1500),
+]
+
+def make_name(index: int):
+    # names may only contain letters and spaces
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(97 + remainder) + letters
+    return f"Employee {letters.capitalize()}"
+
+def make_uuid(rng: random.Random):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def create_rules(rng: random.Random, allowances: int = 8, other_deductions: int = 6):
+    """
+    Create the Tax, Pension and Other deductions and the allowances.
+
+    Returns:
+        tuple: The allowance ids and the other deduction ids.
+    """
+    Deduction.objects.create(type="Tax", data=[
+        {"id": str(make_uuid(rng)), "name": f"Bracket {index + 1}", "min_salary": low, "max_salary": high, "rate": rate, "deduction": deduction}
+        for index, (low, high, rate, deduction) in enumerate(TAX_BRACKETS)
+    ])
+    Deduction.objects.create(type="Pension", data=[{"id": str(make_uuid(rng)), "name": "Pension", "percentage": 7}])
+
+    other = []
+    for index in range(other_deductions):
+        fixed = index % 2 == 0
+        other.append({
+            "id": str(make_uuid(rng)),
+            "name": f"Deduction {index + 1}",
+            "type": "fixed" if fixed else "percentage",
+            "percentage": 0 if fixed else round(rng.uniform(0.5, 5), 2),
+            "amount": round(rng.uniform(50, 500), 2) if fixed else 0,
+            "description": "Synthetic deduction",
+            "is_active": True,
+        })
+    Deduction.objects.create(type="Other", data=other)
+
+    allowance_rows = []
+    for index in range(allowances):
+        fixed = index % 2 == 0
+        allowance_rows.append(Allowance(
+            id=make_uuid(rng),
+            name=f"Allowance {index + 1}",
+            type="fixed" if fixed else "percentage",
+            percentage=0 if fixed else round(rng.uniform(1, 20), 2),
+            amount=round(rng.uniform(100, 2000), 2) if fixed else 0,
+            description="Synthetic allowance",
+        ))
+    Allowance.objects.bulk_create(allowance_rows)
+    return [str(a.id) for a in allowance_rows], [d["id"] for d in other]
+
+def create_organization(rng: random.Random, departments: int = 20, branches: int = 5):
+    department_rows = [Department(id=make_uuid(rng), dep_name=f"Department {index + 1}") for index in range(departments)]
+    Department.objects.bulk_create(department_rows)
+    branch_rows = [
+        CompanyAddress(
+            id=make_uuid(rng),
+            branch_name=f"Branch {index + 1}",
+            branch_phone=f"+2511100000{index:02d}",
+            branch_email=f"branch{index + 1}@example.com",
+            branch_address="Synthetic address",
+        )
+        for index in range(branches)
+    ]
+    CompanyAddress.objects.bulk_create(branch_rows)
+    return department_rows, branch_rows
+
+def generate_workforce(size: int, seed: int = 42):
+    """
+    Generate a synthetic workforce into the current database.
+
+    Args:
+        size: The number of employees.
+        seed: The random seed.
+
+    Returns:
+        dict: The generated row counts.
+    """
+    rng = random.Random(seed)
+    allowance_ids, deduction_ids = create_rules(rng)
+    departments, branches = create_organization(rng)
+
+    batch = []
+    for index in range(size):
+        batch.append(Employee(
+            id=make_uuid(rng),
+            full_name=make_name(index),
+            date_of_birth=date(1970 + rng.randrange(35), rng.randrange(1, 13), rng.randrange(1, 29)),
+            nationality="Ethiopian",
+            email=f"employee{index + 1}@example.com",
+            phone_number=f"+2519{index:08d}",
+            permanent_address="Synthetic address",
+            city="Addis Ababa",
+            state="Addis Ababa",
+            country="Ethiopia",
+            zip_code="1000",
+            contact_person_name="Synthetic contact",
+            contact_person_address="Synthetic address",
+            employee_code=f"EMP{index + 1:06d}",
+            job_title="Engineer",
+            department=departments[rng.randrange(len(departments))],
+            work_location=branches[rng.randrange(len(branches))],
+            hire_date=date(2015 + rng.randrange(10), 1, 1),
+            effective_date=date(2015 + rng.randrange(10), 1, 1),
+            bank_account_number=f"{rng.randrange(10 ** 12):013d}",
+            basic_salary=round(rng.lognormvariate(8.5, 0.8), 2),
+            allowance=rng.sample(allowance_ids, rng.randrange(4)),
+            deduction=rng.sample(deduction_ids, rng.randrange(3)),
+            currency_of_salary="USD" if rng.random() < 0.1 else "ETB",
+        ))
+        if len(batch) >= BULK_SIZE:
+            Employee.objects.bulk_create(batch)
+            batch = []
+    Employee.objects.bulk_create(batch)
+
+    return {
+        "employees": size,
+        "allowances": len(allowance_ids),
+        "other_deductions": len(deduction_ids),
+        "departments": len(departments),
+        "branches": len(branches),
+    }
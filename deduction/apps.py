@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DeductionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'deduction'
+
+    def ready(self):
+        from . import siginal  # noqa: F401
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import post_migrate, post_save, post_delete
 from django.dispatch import receiver
 from django.apps import apps
+from deduction.models import Deduction
+from utility.rule_cache import invalidate_rule_cache
 
 @receiver(post_migrate)
 def create_hr_data(sender, **kwargs):
@@ -18,4 +20,9 @@ def create_hr_data(sender, **kwargs):
         Deduction.objects.get_or_create(
             type="Other",
             defaults={"description": "Any additional deductions not classified under tax or pension, such as loan repayments, insurance premiums, or voluntary contributions, applied according to company policy or employee agreements."},
-        )
\ No newline at end of file
+        )
+
+# drop the cached compensation rules whenever a deduction changes
+@receiver([post_save, post_delete], sender=Deduction)
+def invalidate_deduction_rules(sender, **kwargs):
+    invalidate_rule_cache()
@@ -2,28 +2,46 @@
 # PAYROLL API
 # ===============================================================
 # import the necessary modules
-from ninja import Router
+from ninja import Router, Query
 
 # ===============================
 # MODELS
 # ===============================
-from .models import Payroll
+from .models import Payroll, PayrollRun, PayrollCostRollup, PayrollLineItem, PayrollLedger
 from employees.models import Employee
 
 # ===============================
 # SCHEMAS
 # ===============================
-from .schemas import PayrollResponseSchema, CreatePayrollSchema, PayrollSingleResponseSchema
+from .schemas import PayrollResponseSchema, CreatePayrollSchema, PayrollSingleResponseSchema, PayrollRunResponseSchema
+from .schemas import PayrollPageResponseSchema, SimulatePayrollSchema, PayrollSimulationResponseSchema, PayrollCostRollupResponseSchema
+from .schemas import PayrollLineItemSummaryResponseSchema, PayrollLedgerResponseSchema
 
 # ===============================
 # SERIALIZERS
 # ===============================
-from .serializer import serialize_payroll_list, serialize_payroll_single
+from .serializer import serialize_payroll, serialize_payroll_list, serialize_payroll_single, serialize_payroll_run_single
+from .serializer import serialize_payroll_cost_rollup_list, serialize_payroll_ledger
 
 # ===============================
 # UTILTIS
 # ===============================
-from utility.payroll import get_deductions, get_allowances
+import time
+from datetime import date
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+
+from utility.payroll import load_rule_set, get_pay_period
+from utility.payroll_jobs import queue_payroll_run, resume_payroll_run, get_active_payroll_run, PayrollRunNotResumableError, PayrollRunInProgressError
+from utility.payroll_lock import payroll_period_lock, PayrollPeriodLockedError
+from utility.payroll_engine import to_payment_date, build_payroll, write_payrolls
+from utility.streaming import stream_ndjson, STREAM_FORMATS
+from utility.pagination import keyset_page, InvalidCursorError, DEFAULT_PAGE_SIZE
+from utility.payroll_export import export_payroll_register, EXPORT_FORMATS
+from utility.bank_file import generate_bank_file, BANK_FILE_FORMATS
+from utility.payroll_diff import stream_payroll_diff
+from utility.payroll_simulation import simulate_payroll
+from utility.payroll_rollup import refresh_cost_rollups
 
 # ===============================
 # ROUTERS
@@ -33,42 +51,461 @@ payroll_router = Router()
 # ===============================
 # PAYROLL API ENDPOINTS
 # ===============================
+# =====================================================================
+# Endpoint: Get Payroll Run by ID
+# ---------------------------------------------------------------------
+# This API endpoint reports the state of a payroll run queued by the 
+# create payroll endpoint: its status, progress, throughput, errors 
+# and running totals.
+# The endpoint is registered at the '/runs/{id}' path of the payroll 
+# router (before the generic '/{id}/{employee_id}' path so it is matched 
+# first) and returns a response conforming to the PayrollRunResponseSchema.
+# This endpoint is useful for polling a payroll run until it completes.
+# =====================================================================
+@payroll_router.get(
+    "/runs/{id}", 
+    response=PayrollRunResponseSchema, 
+    description="Get a payroll run by id. Returns the status, progress, throughput, errors and totals of the run.",
+    summary="Get a payroll run by id",
+)
+def get_payroll_run(request, id: str):
+    """
+    Get a payroll run by id.
+
+    Args:
+        request: The request object.
+        id: The id of the payroll run.
+
+    Returns:
+        The response object.
+    """
+    try:
+        run = PayrollRun.objects.get(id=id)
+        result = serialize_payroll_run_single(run)
+        return PayrollRunResponseSchema(status=True, status_code=200, message="Fetch Payroll Run", data=[result])
+    except PayrollRun.DoesNotExist:
+        return PayrollRunResponseSchema(status=False, status_code=404, message="Payroll run not found", data=[])
+    except Exception as e:
+        return PayrollRunResponseSchema(status=False, status_code=404, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Resume Payroll Run
+# ---------------------------------------------------------------------
+# This API endpoint resumes a payroll run that failed or whose worker 
+# died (no progress for PAYROLL_RUN_STALE_SECONDS). The run is queued 
+# again and continues after its checkpoint, the last employee of the 
+# last committed chunk, with its running totals; finished chunks are 
+# not recomputed.
+# The endpoint is registered at the '/runs/{id}/resume' path of the payroll 
+# router and returns a response conforming to the PayrollRunResponseSchema.
+# This endpoint is useful for recovering an interrupted payroll run.
+# =====================================================================
+@payroll_router.post(
+    "/runs/{id}/resume", 
+    response=PayrollRunResponseSchema, 
+    description="Resume a failed or stalled payroll run from its last checkpoint.",
+    summary="Resume a payroll run",
+)
+def resume_payroll_run_endpoint(request, id: str):
+    """
+    Resume a payroll run.
+
+    Args:
+        request: The request object.
+        id: The id of the payroll run.
+
+    Returns:
+        The response object.
+    """
+    try:
+        run = resume_payroll_run(PayrollRun.objects.get(id=id))
+        result = serialize_payroll_run_single(run)
+        return PayrollRunResponseSchema(status=True, status_code=202, message="Payroll run resumed", data=[result])
+    except PayrollRun.DoesNotExist:
+        return PayrollRunResponseSchema(status=False, status_code=404, message="Payroll run not found", data=[])
+    except PayrollRunNotResumableError as e:
+        return PayrollRunResponseSchema(status=False, status_code=409, message=str(e), data=[])
+    except PayrollRunInProgressError as e:
+        return PayrollRunResponseSchema(status=False, status_code=409, message=str(e), data=[serialize_payroll_run_single(e.run)])
+    except Exception as e:
+        return PayrollRunResponseSchema(status=False, status_code=500, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Simulate Payroll
+# ---------------------------------------------------------------------
+# This API endpoint runs a what-if payroll: a salary raise and rule 
+# overrides (tax brackets, pension percentage, allowance values) are 
+# applied to the active employees, optionally restricted to some 
+# employees, departments or branches, and the payroll is computed in 
+# memory against the cached rules. Nothing is written to the payrolls table.
+# The endpoint is registered at the '/simulate' path of the payroll 
+# router (before the generic '/{id}' path so it is matched first) and 
+# returns a response conforming to the PayrollSimulationResponseSchema.
+# On success, it returns the baseline, simulated and delta totals (and the 
+# per employee deltas when 'details' is set); on failure, it returns an 
+# error message and an empty data list.
+# This endpoint is useful for budgeting a raise or a rule change before 
+# applying it.
+# =====================================================================
+@payroll_router.post(
+    "/simulate", 
+    response=PayrollSimulationResponseSchema, 
+    description="Simulate a payroll with a salary raise and rule overrides without writing anything. Returns the aggregate and per employee deltas.",
+    summary="Simulate a payroll",
+)
+def simulate_payroll_endpoint(request, payload: SimulatePayrollSchema):
+    """
+    Simulate a payroll with a salary raise and rule overrides.
+
+    Args:
+        request: The request object.
+        payload: The simulation data.
+
+    Returns:
+        The response object.
+    """
+    try:
+        started = time.perf_counter()
+        result = simulate_payroll(
+            salary_increase_percentage=payload.salary_increase_percentage,
+            employee_ids=payload.employee_ids,
+            department_ids=payload.department_ids,
+            work_location_ids=payload.work_location_ids,
+            tax_brackets=payload.tax_brackets,
+            pension_percentage=payload.pension_percentage,
+            allowance_overrides=[override.dict() for override in payload.allowance_overrides],
+            details=payload.details,
+        )
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return PayrollSimulationResponseSchema(status=True, status_code=200, message="Payroll simulated", data=[result])
+    except ValueError as e:
+        return PayrollSimulationResponseSchema(status=False, status_code=400, message=str(e), data=[])
+    except Exception as e:
+        return PayrollSimulationResponseSchema(status=False, status_code=500, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Get Payroll Cost Rollups
+# ---------------------------------------------------------------------
+# This API endpoint returns the payroll cost per department, branch and 
+# pay period (employee count, gross, allowance, deduction, tax, pension 
+# and net totals) from the rollup table maintained by the payroll runs, 
+# so cost dashboards do not have to read and decode every payroll.
+# The rollups can be filtered by period (any date of the month), 
+# department and branch.
+# The endpoint is registered at the '/rollups' path of the payroll 
+# router (before the generic '/{id}' path so it is matched first) and 
+# returns a response conforming to the PayrollCostRollupResponseSchema.
+# This endpoint is useful for department and branch cost dashboards.
+# =====================================================================
+@payroll_router.get(
+    "/rollups", 
+    response=PayrollCostRollupResponseSchema, 
+    description="Get the payroll cost per department, branch and month. Reads the rollups maintained by the payroll runs.",
+    summary="Get payroll cost rollups",
+)
+def get_payroll_cost_rollups(request, period: date = None, department_id: str = None, work_location_id: str = None):
+    """
+    Get the payroll cost rollups.
+
+    Args:
+        request: The request object.
+        period: Only the rollups of the month of this date.
+        department_id: Only the rollups of this department.
+        work_location_id: Only the rollups of this branch.
+
+    Returns:
+        The response object.
+    """
+    try:
+        rollups = PayrollCostRollup.objects.select_related("department", "work_location")
+        if period:
+            rollups = rollups.filter(pay_period=get_pay_period(period))
+        if department_id:
+            rollups = rollups.filter(department_id=department_id)
+        if work_location_id:
+            rollups = rollups.filter(work_location_id=work_location_id)
+        result = serialize_payroll_cost_rollup_list(rollups)
+        return PayrollCostRollupResponseSchema(status=True, status_code=200, message="Fetch Payroll Cost Rollups", data=result)
+    except Exception as e:
+        return PayrollCostRollupResponseSchema(status=False, status_code=404, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Export Payroll Register
+# ---------------------------------------------------------------------
+# This API endpoint exports the payroll register of a pay period: one 
+# row per employee with the basic salary, each allowance, tax, pension, 
+# each other deduction and the net salary. CSV is streamed while the 
+# rows are read; XLSX is written with a write-only workbook. Both read 
+# the payrolls with a server-side cursor, so large periods are exported 
+# in constant memory.
+# The endpoint is registered at the '/export' path of the payroll 
+# router (before the generic '/{id}' path so it is matched first) and 
+# returns the file; on failure, it returns a response conforming to 
+# the PayrollResponseSchema with an error message.
+# This endpoint is useful for payroll officers exporting the monthly register.
+# =====================================================================
+@payroll_router.get(
+    "/export", 
+    response=PayrollResponseSchema, 
+    description="Export the payroll register of a pay period as CSV (streamed) or XLSX, one row per employee.",
+    summary="Export the payroll register",
+)
+def export_payroll(request, period: date, format: str = "csv"):
+    """
+    Export the payroll register of a pay period.
+
+    Args:
+        request: The request object.
+        period: Any date of the month to export.
+        format: 'csv' or 'xlsx'.
+
+    Returns:
+        The file response.
+    """
+    try:
+        if format not in EXPORT_FORMATS:
+            return PayrollResponseSchema(status=False, status_code=400, message=f"Format must be one of {', '.join(EXPORT_FORMATS)}", data=[])
+        return export_payroll_register(get_pay_period(period), format)
+    except Exception as e:
+        return PayrollResponseSchema(status=False, status_code=500, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Generate Bank Transfer File
+# ---------------------------------------------------------------------
+# This API endpoint streams the bank transfer file of a pay period: the 
+# net pay of every payroll to the employee's bank account, in one batch 
+# per salary currency. Each batch ends with a trailer holding its record 
+# count, total amount, account hash total and SHA-256 checksum, and the 
+# file ends with a trailer covering all batches.
+# The endpoint is registered at the '/bank-file' path of the payroll 
+# router (before the generic '/{id}' path so it is matched first) and 
+# returns the file; on failure, it returns a response conforming to 
+# the PayrollResponseSchema with an error message.
+# This endpoint is useful for handing the payroll of a month to the bank.
+# =====================================================================
+@payroll_router.get(
+    "/bank-file", 
+    response=PayrollResponseSchema, 
+    description="Stream the bank transfer file of a pay period as fixed-width records or CSV, one batch per salary currency with totals and checksums.",
+    summary="Generate the bank transfer file",
+)
+def get_bank_file(request, period: date, format: str = "fixed"):
+    """
+    Generate the bank transfer file of a pay period.
+
+    Args:
+        request: The request object.
+        period: Any date of the month to pay.
+        format: 'fixed' or 'csv'.
+
+    Returns:
+        The file response.
+    """
+    try:
+        if format not in BANK_FILE_FORMATS:
+            return PayrollResponseSchema(status=False, status_code=400, message=f"Format must be one of {', '.join(BANK_FILE_FORMATS)}", data=[])
+        return generate_bank_file(get_pay_period(period), format)
+    except Exception as e:
+        return PayrollResponseSchema(status=False, status_code=500, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Get Payroll Line Item Summary
+# ---------------------------------------------------------------------
+# This API endpoint sums the payroll line items per kind and rule with a 
+# single GROUP BY in the database: the total tax, pension, and the total 
+# and number of receivers of each allowance and other deduction. 
+# The summary can be filtered by period (any date of the month), kind 
+# and rule id.
+# The endpoint is registered at the '/line-items/summary' path of the payroll 
+# router (before the generic '/{id}/{employee_id}' path so it is matched 
+# first) and returns a response conforming to the PayrollLineItemSummaryResponseSchema.
+# This endpoint is useful for allowance and deduction reports.
+# =====================================================================
+@payroll_router.get(
+    "/line-items/summary", 
+    response=PayrollLineItemSummaryResponseSchema, 
+    description="Get the total and the number of payrolls of every allowance, tax, pension and deduction rule, summed in the database.",
+    summary="Get the payroll line item summary",
+)
+def get_payroll_line_item_summary(request, period: date = None, kind: str = None, rule_id: str = None):
+    """
+    Get the payroll line item summary.
+
+    Args:
+        request: The request object.
+        period: Only the line items of the month of this date.
+        kind: Only the line items of this kind.
+        rule_id: Only the line items of this rule.
+
+    Returns:
+        The response object.
+    """
+    try:
+        line_items = PayrollLineItem.objects.all()
+        if period:
+            line_items = line_items.filter(pay_period=get_pay_period(period))
+        if kind:
+            line_items = line_items.filter(kind=kind)
+        if rule_id:
+            line_items = line_items.filter(rule_id=rule_id)
+        result = list(
+            line_items
+            .values("kind", "rule_id")
+            .annotate(name=Max("name"), employee_count=Count("payroll_id", distinct=True), total=Sum("amount"))
+            .order_by("kind", "name")
+        )
+        return PayrollLineItemSummaryResponseSchema(status=True, status_code=200, message="Fetch Payroll Line Item Summary", data=result)
+    except Exception as e:
+        return PayrollLineItemSummaryResponseSchema(status=False, status_code=404, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Get Year-to-date Payroll Totals by Employee ID
+# ---------------------------------------------------------------------
+# This API endpoint returns the year-to-date payroll totals of an 
+# employee (gross, allowances, deductions, tax, pension and net) from 
+# the payroll ledger, which the payroll runs keep up to date, so no 
+# payroll has to be read.
+# The endpoint is registered at the '/ytd/{employee_id}' path of the payroll 
+# router (before the generic '/{id}/{employee_id}' path so it is matched 
+# first) and returns a response conforming to the PayrollLedgerResponseSchema.
+# Without a year, the ledgers of every year of the employee are returned.
+# This endpoint is useful for payslips and annual tax statements.
+# =====================================================================
+@payroll_router.get(
+    "/ytd/{employee_id}", 
+    response=PayrollLedgerResponseSchema, 
+    description="Get the year-to-date payroll totals of an employee from the payroll ledger.",
+    summary="Get year-to-date payroll totals by employee id",
+)
+def get_payroll_ytd(request, employee_id: str, year: int = None):
+    """
+    Get the year-to-date payroll totals of an employee.
+
+    Args:
+        request: The request object.
+        employee_id: The id of the employee.
+        year: Only the ledger of this year.
+
+    Returns:
+        The response object.
+    """
+    try:
+        if year:
+            ledger = PayrollLedger.objects.get(employee_id=employee_id, year=year)
+            return PayrollLedgerResponseSchema(status=True, status_code=200, message="Fetch Payroll Ledger", data=[serialize_payroll_ledger(ledger)])
+        result = [serialize_payroll_ledger(ledger) for ledger in PayrollLedger.objects.filter(employee_id=employee_id)]
+        return PayrollLedgerResponseSchema(status=True, status_code=200, message="Fetch Payroll Ledger", data=result)
+    except PayrollLedger.DoesNotExist:
+        return PayrollLedgerResponseSchema(status=False, status_code=404, message="Payroll ledger not found", data=[])
+    except Exception as e:
+        return PayrollLedgerResponseSchema(status=False, status_code=404, message=str(e), data=[])
+
+# =====================================================================
+# Endpoint: Diff Payrolls Between Two Pay Periods
+# ---------------------------------------------------------------------
+# This API endpoint compares the payrolls of two pay periods employee by 
+# employee and streams, as newline delimited JSON, only the employees 
+# whose gross, net or line items changed (or who were added or removed) 
+# with the deltas, followed by a summary line.
+# Both periods are joined per employee in a single query and the line 
+# items are compared chunk by chunk, so large runs are diffed quickly.
+# The endpoint is registered at the '/diff' path of the payroll 
+# router (before the generic '/{id}' path so it is matched first) and 
+# streams the result; on failure, it returns a response conforming to 
+# the PayrollResponseSchema with an error message.
+# This endpoint is useful for reviewing a payroll run before approving it.
+# =====================================================================
+@payroll_router.get(
+    "/diff", 
+    response=PayrollResponseSchema, 
+    description="Stream the employees whose payroll changed between two pay periods (from and to, any date of the month) with the gross, net and line item deltas.",
+    summary="Diff payrolls between two pay periods",
+)
+def get_payroll_diff(request, from_period: date = Query(..., alias="from"), to_period: date = Query(..., alias="to")):
+    """
+    Diff the payrolls of two pay periods.
+
+    Args:
+        request: The request object.
+        from_period: Any date of the month compared from.
+        to_period: Any date of the month compared to.
+
+    Returns:
+        The streamed response.
+    """
+    try:
+        return stream_payroll_diff(get_pay_period(from_period), get_pay_period(to_period))
+    except Exception as e:
+        return PayrollResponseSchema(status=False, status_code=500, message=str(e), data=[])
+
 # =====================================================================
 # Endpoint: Get All Payrolls
 # ---------------------------------------------------------------------
-# This API endpoint retrieves all payroll records from the database 
-# that have not been marked as deleted (i.e., is_deleted=False). 
-# It uses the Payroll model to query the database.
+# This API endpoint retrieves the payroll records from the database, 
+# newest payment date first, one page at a time. Pages are read by 
+# keyset on (payment_date, id): pass the 'next_cursor' of a page as 
+# 'cursor' to get the next one, so every page costs the same whatever 
+# the size of the table.
+# The payrolls can be filtered by pay period (any date of the month), 
+# department, branch and employee.
 # The endpoint is registered at the '/' path of the payroll 
-# router and returns a response conforming to the PayrollResponseSchema.
-# On success, it returns a list of all payrolls with their details; 
+# router and returns a response conforming to the PayrollPageResponseSchema.
+# On success, it returns the payrolls of the page with their details; 
 # on failure, it returns an error message and an empty data list.
 # This endpoint is useful for administrative interfaces or dashboards 
-# where a complete overview of all current payrolls is required.
+# where an overview of the payrolls is required.
 # =====================================================================
 @payroll_router.get(
     "/", 
-    response=PayrollResponseSchema, 
-    description="Get all payrolls. Returns a list of all payrolls with their details. Useful for administrative overviews and management dashboards.",
+    response=PayrollPageResponseSchema, 
+    description="Get payrolls, newest first, one page at a time. Pass the returned next_cursor as cursor to get the next page, filter by period, department, branch or employee, or pass stream=ndjson to stream every matching payroll one per line. Useful for administrative overviews and management dashboards.",
     summary="Get all payrolls",
 )
-def get_payroll(request):
+def get_payroll(
+    request,
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    period: date = None,
+    department_id: str = None,
+    work_location_id: str = None,
+    employee_id: str = None,
+    stream: str = None,
+):
     """
     Get all payrolls.
 
     Args:
         request: The request object.
+        cursor: The next_cursor of the previous page.
+        limit: The number of payrolls of the page.
+        period: Only the payrolls of the month of this date.
+        department_id: Only the payrolls of this department.
+        work_location_id: Only the payrolls of this branch.
+        employee_id: Only the payrolls of this employee.
+        stream: 'ndjson' to stream the payrolls as newline delimited JSON.
 
     Returns:
         The response object.
     """
     try:
-        payrolls = Payroll.objects.select_related('employee_id').all()
-        print(payrolls)
-        result = serialize_payroll_list(payrolls)
-        return PayrollResponseSchema(status=True, status_code=200, message="Fetch Payrolls", data=result)
+        payrolls = Payroll.objects.select_related('employee_id', 'employee_id__department', 'employee_id__department__manager')
+        if period:
+            payrolls = payrolls.filter(pay_period=get_pay_period(period))
+        if department_id:
+            payrolls = payrolls.filter(department_id=department_id)
+        if work_location_id:
+            payrolls = payrolls.filter(work_location_id=work_location_id)
+        if employee_id:
+            payrolls = payrolls.filter(employee_id=employee_id)
+        if stream in STREAM_FORMATS:
+            return stream_ndjson(payrolls.order_by("-payment_date", "-id"), serialize_payroll)
+        page, next_cursor = keyset_page(payrolls, cursor, limit)
+        result = serialize_payroll_list(page)
+        return PayrollPageResponseSchema(status=True, status_code=200, message="Fetch Payrolls", data=result, next_cursor=next_cursor)
+    except InvalidCursorError as e:
+        return PayrollPageResponseSchema(status=False, status_code=400, message=str(e), data=[])
     except Exception as e:
-        return PayrollResponseSchema(status=False, status_code=404, message=str(e), data=[])
+        return PayrollPageResponseSchema(status=False, status_code=404, message=str(e), data=[])
     
 # =====================================================================
 # Endpoint: Get Payroll by Employee ID
@@ -227,18 +664,26 @@ def get_all_payrolls_by_employee_id(request, employee_id: str):
 # =====================================================================
 # Endpoint: Create Payroll for All Active Employees
 # ---------------------------------------------------------------------
-# This API endpoint creates a new payroll record for all active employees for a given month. It uses the Payroll model to create the new record.
+# This API endpoint queues a payroll run for all active employees for a given month. 
+# The run is executed in the background by the payroll worker pool in 
+# chunks, so the request returns right away with the queued run. 
+# With 'incremental' set, only the employees whose payroll inputs changed 
+# since the last run of the period are recomputed. With 'shard_by' the 
+# employees are split by department or work location and the shards are 
+# computed in parallel worker processes.
 # The endpoint is registered at the '/' path of the payroll 
-# router and returns a response conforming to the PayrollResponseSchema.
-# On success, it returns the created payroll with its details; on failure, 
-# it returns an error message and an empty data list.
+# router and returns a response conforming to the PayrollRunResponseSchema.
+# On success, it returns the queued run whose progress can be polled at 
+# '/runs/{id}'. When a run of the same month is already pending or running 
+# on any node, it returns a 409 with that run instead of starting another 
+# one; on failure, it returns an error message and an empty data list.
 # This endpoint is useful for administrative interfaces or dashboards 
 # where a new payroll can be created for all active employees for a given month.
 # =====================================================================
 @payroll_router.post(
     "/", 
-    response=PayrollResponseSchema, 
-    description="Create a new payroll for all active employees for a given month. Returns the created payroll with its details. Useful for administrative overviews and management dashboards.",
+    response=PayrollRunResponseSchema, 
+    description="Create a new payroll for all active employees for a given month. Queues a background payroll run and returns it right away; poll '/runs/{id}' for its progress.",
     summary="Create a new payroll for all active employees for a given month",
 )
 def create_payroll(request, payroll: CreatePayrollSchema):
@@ -253,28 +698,21 @@ def create_payroll(request, payroll: CreatePayrollSchema):
         The response object.
     """
     try:
-        employees = Employee.objects.filter(is_deleted=False, is_active=True)
-        payroll_list = []
-        for employee in employees:
-            all_allowance = get_allowances(employee.allowance, employee.basic_salary)
-            all_deduction = get_deductions(employee.deduction, employee.basic_salary)
-            payroll = Payroll.objects.create(
-                employee_id=employee,
-                basic_salary=employee.basic_salary,
-                allowance=all_allowance,
-                deduction=all_deduction,
-                payment_date=payroll.payment_date
-            )
-            result = serialize_payroll_single(payroll)
-            payroll_list.append(result)
-        return PayrollResponseSchema(status=True, status_code=200, message="Payroll created successfully", data=payroll_list)
+        run = queue_payroll_run(to_payment_date(payroll.payment_date), payroll.incremental, payroll.shard_by)
+        result = serialize_payroll_run_single(run)
+        return PayrollRunResponseSchema(status=True, status_code=202, message="Payroll run queued", data=[result])
+    except PayrollRunInProgressError as e:
+        # the caller gets the run already in progress to poll instead
+        return PayrollRunResponseSchema(status=False, status_code=409, message=str(e), data=[serialize_payroll_run_single(e.run)])
     except Exception as e:
-        return PayrollResponseSchema(status=False, status_code=404, message=str(e), data=[])
+        return PayrollRunResponseSchema(status=False, status_code=404, message=str(e), data=[])
     
 # =====================================================================
 # Endpoint: Create Payroll by Employee ID
 # ---------------------------------------------------------------------
 # This API endpoint creates a new payroll record for a specific employee for a given month. It uses the Payroll model to create the new record.
+# The write holds the pay period lock of the payroll runs: while a run of 
+# the same month is in progress it returns a 409 with that run instead.
 # The endpoint is registered at the '/employee/{employee_id}' path of the payroll 
 # router and returns a response conforming to the PayrollResponseSchema.
 # On success, it returns the created payroll with its details; on failure, 
@@ -282,7 +720,7 @@ def create_payroll(request, payroll: CreatePayrollSchema):
 # This endpoint is useful for administrative interfaces or dashboards 
 # where a new payroll can be created for a specific employee for a given month.
 # =====================================================================
-@payroll_router.post("/employee/{employee_id}", response=PayrollResponseSchema, 
+@payroll_router.post("/employee/{employee_id}", response=PayrollResponseSchema | PayrollRunResponseSchema, 
     description="Create a payroll by employee id. Returns the created payroll with its details. Useful for administrative overviews and management dashboards.",
     summary="Create a payroll by employee id",
 )
@@ -300,21 +738,24 @@ def create_payroll_by_employee_id(request, employee_id: str, payload: CreatePayr
     """
     try:
         employee = Employee.objects.get(id=employee_id, is_deleted=False, is_active=True)
-        all_deduction = get_deductions(employee.deduction, employee.basic_salary)
-        all_allowance = get_allowances(employee.allowance, employee.basic_salary)
+        rules = load_rule_set()
         
         # ===============================
         # CREATE PAYROLL
         # ===============================
-        payroll = Payroll.objects.create(
-            employee_id=employee,
-            basic_salary=employee.basic_salary,
-            allowance=all_allowance,
-            deduction=all_deduction,
-            payment_date=payload.payment_date
-        )
+        payroll = build_payroll(employee, to_payment_date(payload.payment_date), rules)
+        # the same per period lock as the payroll runs, so the write cannot
+        # interleave with a run of the period on any node
+        with payroll_period_lock(payroll.pay_period, f"employee:{employee.id}"):
+            with transaction.atomic():
+                write_payrolls([payroll])
+                refresh_cost_rollups(payroll.pay_period)
         result = serialize_payroll_single(payroll)
-        return PayrollResponseSchema(status=True, status_code=200, message="Payroll created successfully", data=[])
+        return PayrollResponseSchema(status=True, status_code=200, message="Payroll created successfully", data=[result])
+    except PayrollPeriodLockedError as e:
+        # the caller gets the run in progress to poll, like POST '/'
+        run = get_active_payroll_run(get_pay_period(to_payment_date(payload.payment_date)))
+        return PayrollRunResponseSchema(status=False, status_code=409, message=str(e), data=[serialize_payroll_run_single(run)] if run else [])
     except Employee.DoesNotExist:
         return PayrollResponseSchema(status=False, status_code=404, message="Employee not found", data=[])
     except Exception as e:
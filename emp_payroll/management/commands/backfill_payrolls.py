@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from utility.payroll_backfill import backfill_pay_periods, backfill_payroll_totals
+
+class Command(BaseCommand):
+    help = "Backfill the pay period and totals of the existing payrolls and remove the duplicates of a month"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs["dry_run"]
+        prefix = "Would backfill" if dry_run else "Backfilled"
+
+        # the periods first: the totals backfill rebuilds the rollups and ledger per period
+        updated, removed = backfill_pay_periods(dry_run)
+        self.stdout.write(f"{prefix} the pay period of {updated} payrolls, {removed} duplicate payrolls of a month {'to remove' if dry_run else 'removed'}")
+
+        updated, skipped = backfill_payroll_totals(dry_run)
+        self.stdout.write(f"{prefix} the totals of {updated} payrolls, {skipped} payrolls with unreadable breakdowns skipped")
+        self.stdout.write(self.style.SUCCESS("Payroll backfill done"))
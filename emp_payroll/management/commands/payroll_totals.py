@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+import time
+
+from utility.payroll import load_rule_set
+from utility.payroll_vector import load_workforce, compute_workforce, reconcile_with_scalar
+
+class Command(BaseCommand):
+    help = "Compute the payroll totals of the whole active workforce with the vectorized calculator"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reconcile", action="store_true", help="Check the vectorized totals against the scalar path bit for bit")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rules = load_rule_set()
+        workforce = load_workforce()
+        result = compute_workforce(workforce, rules)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Employees: {len(workforce['ids'])}")
+        self.stdout.write(f"Basic salary: {workforce['salary'].sum():.2f}")
+        self.stdout.write(f"Allowances: {result['allowance_total'].sum():.2f}")
+        self.stdout.write(f"Tax: {result['tax'].sum():.2f}")
+        self.stdout.write(f"Pension: {result['pension'].sum():.2f}")
+        self.stdout.write(f"Deductions: {result['deduction_total'].sum():.2f}")
+        self.stdout.write(f"Net pay: {result['net'].sum():.2f}")
+        self.stdout.write(f"Computed in {elapsed:.3f}s")
+
+        if options["reconcile"]:
+            mismatches = reconcile_with_scalar(workforce, result, rules)
+            if mismatches:
+                for mismatch in mismatches:
+                    self.stderr.write(str(mismatch))
+                self.stderr.write(self.style.ERROR(f"{len(mismatches)} employees differ from the scalar path"))
+            else:
+                self.stdout.write(self.style.SUCCESS("Vectorized totals match the scalar path bit for bit"))
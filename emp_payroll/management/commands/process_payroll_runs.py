@@ -0,0 +1,28 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from emp_payroll.models import PayrollRun
+from utility.payroll_jobs import PAYROLL_RUN_STALE_SECONDS, execute_run
+
+class Command(BaseCommand):
+    help = "Execute the queued (pending) payroll runs in this process"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--resume", action="store_true", help="Also resume the failed and stalled runs from their checkpoint")
+
+    def handle(self, *args, **kwargs):
+        runs = Q(status="pending")
+        if kwargs["resume"]:
+            stale = timezone.now() - timedelta(seconds=PAYROLL_RUN_STALE_SECONDS)
+            runs |= Q(status="failed") | Q(status="running", updated_at__lt=stale)
+
+        run_ids = list(PayrollRun.objects.filter(runs).order_by("created_at").values_list("id", flat=True))
+        for run_id in run_ids:
+            self.stdout.write(f"Executing payroll run {run_id}")
+            execute_run(run_id)
+            run = PayrollRun.objects.get(id=run_id)
+            self.stdout.write(f"Payroll run {run_id} {run.status}: {run.processed_employees}/{run.total_employees} employees")
+        self.stdout.write(self.style.SUCCESS(f"{len(run_ids)} payroll runs processed"))
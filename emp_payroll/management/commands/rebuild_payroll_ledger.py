@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from utility.payroll_ledger import rebuild_payroll_ledger
+
+class Command(BaseCommand):
+    help = "Recompute the year-to-date payroll ledger from the payrolls"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, default=None, help="Only rebuild this year")
+
+    def handle(self, *args, **kwargs):
+        written = rebuild_payroll_ledger(kwargs["year"])
+        self.stdout.write(self.style.SUCCESS(f"{written} ledger rows rebuilt"))
@@ -14,22 +14,254 @@ class Payroll(models.Model):
 
     # Basic Information
     employee_id = models.ForeignKey('employees.Employee', on_delete=models.PROTECT, verbose_name="Employee", null=False, blank=False, related_name="payrolls")
+    # department and branch of the employee when the payroll was computed
+    department = models.ForeignKey('department.Department', on_delete=models.SET_NULL, verbose_name="Department", null=True, blank=True, related_name="payrolls")
+    work_location = models.ForeignKey('company_address.CompanyAddress', on_delete=models.SET_NULL, verbose_name="Work Location", null=True, blank=True, related_name="payrolls")
 
     # Salary Info
     basic_salary = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)], verbose_name="Basic Salary", null=False, blank=False, default=0.00)
     allowance = models.JSONField(default=list, verbose_name="Allowance", null=False, blank=False )
     deduction = models.JSONField(default=dict, verbose_name="Deduction", null=False, blank=False )
     payment_date = models.DateField(verbose_name="Payment Date", null=False, blank=False)
+    # null only on payrolls written before the column existed, until the
+    # backfill_payrolls command sets them (NULLs never conflict in the
+    # unique constraint below, so it can be created before the backfill)
+    pay_period = models.DateField(verbose_name="Pay Period (first day of the month)", null=True, blank=False)
+    input_fingerprint = models.CharField(max_length=64, verbose_name="Input Fingerprint", null=False, blank=True, default="")
+
+    # Totals (copied from the allowance and deduction breakdowns)
+    gross_salary = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Gross Salary", null=False, blank=False, default=0.00)
+    total_allowance = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Total Allowance", null=False, blank=False, default=0.00)
+    total_deduction = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Total Deduction", null=False, blank=False, default=0.00)
+    tax = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Tax", null=False, blank=False, default=0.00)
+    pension = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Pension", null=False, blank=False, default=0.00)
+    net_salary = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Net Salary", null=False, blank=False, default=0.00)
 
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
 
     class Meta:
-        ordering = ["-created_at"]
+        ordering = ["-payment_date", "-id"]
         verbose_name = "Payroll"
         verbose_name_plural = "Payrolls"
         db_table = "payrolls"
+        constraints = [
+            models.UniqueConstraint(fields=["employee_id", "pay_period"], name="unique_payroll_employee_pay_period"),
+        ]
+        # keyset pagination indexes, one per filter of the payroll list
+        indexes = [
+            models.Index(fields=["-payment_date", "-id"], name="payroll_date_id_idx"),
+            models.Index(fields=["pay_period", "-payment_date", "-id"], name="payroll_period_date_id_idx"),
+            models.Index(fields=["department", "-payment_date", "-id"], name="payroll_dept_date_id_idx"),
+            models.Index(fields=["work_location", "-payment_date", "-id"], name="payroll_branch_date_id_idx"),
+            models.Index(fields=["employee_id", "-payment_date", "-id"], name="payroll_emp_date_id_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id.full_name} - {self.payment_date}"
+
+# ===============================
+# PAYROLL LINE ITEM MODEL
+# ===============================
+# Payroll Line Item Kind Choices
+PayrollLineItemKind = [
+    ('allowance', 'Allowance'),
+    ('tax', 'Tax'),
+    ('pension', 'Pension'),
+    ('deduction', 'Deduction'),
+]
+
+# One allowance or deduction amount of a payroll, so reports can sum them
+# in SQL instead of decoding the allowance and deduction JSON.
+class PayrollLineItem(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Basic Information
+    payroll = models.ForeignKey(Payroll, on_delete=models.CASCADE, verbose_name="Payroll", null=False, blank=False, related_name="line_items")
+    pay_period = models.DateField(verbose_name="Pay Period (first day of the month)", null=False, blank=False)
+    kind = models.CharField(max_length=20, choices=PayrollLineItemKind, verbose_name="Kind", null=False, blank=False)
+    rule_id = models.CharField(max_length=64, verbose_name="Rule ID", null=False, blank=True, default="")
+    name = models.CharField(max_length=255, verbose_name="Name", null=False, blank=True, default="")
+    amount = models.DecimalField(max_digits=12, decimal_places=2, verbose_name="Amount", null=False, blank=False, default=0.00)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        ordering = ["kind", "name"]
+        verbose_name = "Payroll Line Item"
+        verbose_name_plural = "Payroll Line Items"
+        db_table = "payroll_line_items"
+        indexes = [
+            models.Index(fields=["rule_id", "pay_period"], name="payroll_item_rule_period_idx"),
+            models.Index(fields=["pay_period", "kind"], name="payroll_item_period_kind_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} - {self.name} - {self.amount}"
+
+# ===============================
+# PAYROLL LEDGER MODEL
+# ===============================
+# Year-to-date totals of an employee, kept in step with the payrolls.
+class PayrollLedger(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Ledger Key
+    employee = models.ForeignKey('employees.Employee', on_delete=models.CASCADE, verbose_name="Employee", null=False, blank=False, related_name="payroll_ledgers")
+    year = models.PositiveSmallIntegerField(verbose_name="Year", null=False, blank=False)
+
+    # Year-to-date Totals
+    payroll_count = models.PositiveIntegerField(default=0, verbose_name="Payroll Count")
+    gross_salary = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Gross Salary", null=False, blank=False, default=0.00)
+    total_allowance = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Total Allowance", null=False, blank=False, default=0.00)
+    total_deduction = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Total Deduction", null=False, blank=False, default=0.00)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Tax", null=False, blank=False, default=0.00)
+    pension = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Pension", null=False, blank=False, default=0.00)
+    net_salary = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Net Salary", null=False, blank=False, default=0.00)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        ordering = ["-year"]
+        verbose_name = "Payroll Ledger"
+        verbose_name_plural = "Payroll Ledgers"
+        db_table = "payroll_ledgers"
+        constraints = [
+            models.UniqueConstraint(fields=["employee", "year"], name="unique_payroll_ledger_employee_year"),
+        ]
+
+    def __str__(self):
+        return f"{self.employee_id} - {self.year}"
+
+# ===============================
+# PAYROLL RUN MODEL
+# ===============================
+# Payroll Run Status Choices
+PayrollRunStatus = [
+    ('pending', 'Pending'),
+    ('running', 'Running'),
+    ('completed', 'Completed'),
+    ('failed', 'Failed'),
+]
+
+# Payroll Run Shard Choices
+PayrollRunShardBy = [
+    ('', 'Not Sharded'),
+    ('department', 'Department'),
+    ('work_location', 'Work Location'),
+]
+
+class PayrollRun(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Run Information
+    payment_date = models.DateField(verbose_name="Payment Date", null=False, blank=False)
+    pay_period = models.DateField(verbose_name="Pay Period (first day of the month)", null=False, blank=False)
+    status = models.CharField(max_length=20, choices=PayrollRunStatus, verbose_name="Status", null=False, blank=False, default="pending")
+    incremental = models.BooleanField(default=False, verbose_name="Incremental (only recompute changed inputs)")
+    shard_by = models.CharField(max_length=20, choices=PayrollRunShardBy, verbose_name="Shard By (parallel run)", null=False, blank=True, default="")
+
+    # Progress Information
+    total_employees = models.PositiveIntegerField(default=0, verbose_name="Total Employees")
+    processed_employees = models.PositiveIntegerField(default=0, verbose_name="Processed Employees")
+    skipped_employees = models.PositiveIntegerField(default=0, verbose_name="Skipped Employees")
+    recomputed_employees = models.PositiveIntegerField(default=0, verbose_name="Recomputed Employees")
+    written_payrolls = models.PositiveIntegerField(default=0, verbose_name="Written Payrolls")
+    unchanged_payrolls = models.PositiveIntegerField(default=0, verbose_name="Unchanged Payrolls")
+    query_count = models.PositiveIntegerField(default=0, verbose_name="Query Count")
+    errors = models.JSONField(default=list, verbose_name="Errors", null=False, blank=True)
+    totals = models.JSONField(default=dict, verbose_name="Totals", null=False, blank=True)
+
+    # Checkpoint (last employee of the last committed chunk)
+    checkpoint_employee_id = models.UUIDField(null=True, blank=True, verbose_name="Checkpoint Employee ID")
+    checkpoint_at = models.DateTimeField(null=True, blank=True, verbose_name="Checkpoint At")
+
+    # Timestamps
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Started At")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Finished At")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        ordering = ["-created_at"]
+        verbose_name = "Payroll Run"
+        verbose_name_plural = "Payroll Runs"
+        db_table = "payroll_runs"
+        constraints = [
+            # one pending or running run per pay period across every node
+            models.UniqueConstraint(
+                fields=["pay_period"],
+                condition=models.Q(status__in=["pending", "running"]),
+                name="unique_active_payroll_run_pay_period",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.payment_date} - {self.status}"
+
+# ===============================
+# PAYROLL COST ROLLUP MODEL
+# ===============================
+# Payroll cost per department, branch and pay period, rebuilt from the
+# payrolls table at the end of every payroll run.
+class PayrollCostRollup(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Rollup Key
+    department = models.ForeignKey('department.Department', on_delete=models.CASCADE, verbose_name="Department", null=True, blank=True, related_name="payroll_rollups")
+    work_location = models.ForeignKey('company_address.CompanyAddress', on_delete=models.CASCADE, verbose_name="Work Location", null=True, blank=True, related_name="payroll_rollups")
+    pay_period = models.DateField(verbose_name="Pay Period (first day of the month)", null=False, blank=False)
+
+    # Totals
+    employee_count = models.PositiveIntegerField(default=0, verbose_name="Employee Count")
+    basic_salary = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Basic Salary", null=False, blank=False, default=0.00)
+    gross_salary = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Gross Salary", null=False, blank=False, default=0.00)
+    total_allowance = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Allowance", null=False, blank=False, default=0.00)
+    total_deduction = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Total Deduction", null=False, blank=False, default=0.00)
+    tax = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Tax", null=False, blank=False, default=0.00)
+    pension = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Pension", null=False, blank=False, default=0.00)
+    net_salary = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Net Salary", null=False, blank=False, default=0.00)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Updated At")
+
+    class Meta:
+        ordering = ["-pay_period"]
+        verbose_name = "Payroll Cost Rollup"
+        verbose_name_plural = "Payroll Cost Rollups"
+        db_table = "payroll_cost_rollups"
+        indexes = [
+            models.Index(fields=["pay_period", "department", "work_location"], name="payroll_rollup_period_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.pay_period} - {self.department_id} - {self.work_location_id}"
+
+# ===============================
+# PAYROLL RUN LOCK MODEL
+# ===============================
+# Pay period lock of the workers on databases without advisory locks
+# (SQLite), see utility/payroll_lock.py.
+class PayrollRunLock(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Lock Information
+    pay_period = models.DateField(unique=True, verbose_name="Pay Period (first day of the month)", null=False, blank=False)
+    owner = models.CharField(max_length=255, verbose_name="Owner", null=False, blank=True, default="")
+
+    # Timestamps
+    acquired_at = models.DateTimeField(auto_now_add=True, verbose_name="Acquired At")
+
+    class Meta:
+        ordering = ["-acquired_at"]
+        verbose_name = "Payroll Run Lock"
+        verbose_name_plural = "Payroll Run Locks"
+        db_table = "payroll_run_locks"
 
     def __str__(self):
-        return f"{self.employee_id.full_name} - {self.payment_date}"
\ No newline at end of file
+        return f"{self.pay_period} - {self.owner}"
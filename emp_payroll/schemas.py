@@ -5,7 +5,8 @@
 from ninja import Schema, Field
 
 import uuid
-from datetime import datetime
+from datetime import datetime, date
+from typing import Literal
 
 # ===============================
 # Employee SCHEMA
@@ -28,6 +29,8 @@ class DepartmentSchema(Schema):
 # create and update payroll
 class CreatePayrollSchema(Schema):
     payment_date: datetime = Field(..., description="The payment date of the payroll")
+    incremental: bool = Field(False, description="Only recompute the payrolls whose inputs changed since the last run of the period")
+    shard_by: Literal["department", "work_location"] | None = Field(None, description="Run in parallel worker processes, one shard per department or work location")
 
 # payroll schema
 class PayrollSchema(Schema):
@@ -46,9 +49,154 @@ class PayrollResponseSchema(Schema):
     message: str = Field(..., description="The message of the response")
     data: list[PayrollSchema] = Field(..., description="The data of the response")
 
+# payroll page response schema
+class PayrollPageResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollSchema] = Field(..., description="The payrolls of the page")
+    next_cursor: str | None = Field(None, description="The cursor of the next page, null on the last page")
+
 # single payroll response schema
 class PayrollSingleResponseSchema(Schema):
     status: bool = Field(..., description="The status of the response")
     status_code: int = Field(..., description="The status code of the response")
     message: str = Field(..., description="The message of the response")
-    data: PayrollSchema = Field(..., description="The single payroll data")  # Single object, not list
\ No newline at end of file
+    data: PayrollSchema = Field(..., description="The single payroll data")  # Single object, not list
+
+# ===============================
+# PAYROLL RUN SCHEMA
+# ===============================
+# payroll run schema
+class PayrollRunSchema(Schema):
+    id: uuid.UUID = Field(..., description="The id of the payroll run")
+    payment_date: date = Field(..., description="The payment date of the payroll run")
+    pay_period: date = Field(..., description="The pay period (first day of the month) of the payroll run")
+    status: str = Field(..., description="The status of the payroll run (pending, running, completed, failed)")
+    total_employees: int = Field(..., description="The number of active employees in the run")
+    incremental: bool = Field(..., description="Whether the run only recomputes the payrolls whose inputs changed")
+    shard_by: str = Field(..., description="The shard key of a parallel run (department, work_location), empty when not sharded")
+    processed_employees: int = Field(..., description="The number of employees processed so far")
+    skipped_employees: int = Field(..., description="The number of employees skipped because their inputs did not change")
+    recomputed_employees: int = Field(..., description="The number of employees whose payroll was recomputed")
+    written_payrolls: int = Field(..., description="The number of payrolls inserted or rewritten so far")
+    unchanged_payrolls: int = Field(..., description="The number of stored payrolls left untouched because nothing changed")
+    progress: float = Field(..., description="The progress of the run in percent")
+    throughput: float = Field(..., description="The processed employees per second")
+    query_count: int = Field(..., description="The number of SQL queries executed by the run")
+    errors: list[dict] = Field(..., description="The errors of the run")
+    totals: dict = Field(..., description="The running totals of the run (basic_salary, allowance, deduction, net)")
+    checkpoint_employee_id: uuid.UUID | None = Field(None, description="The last employee of the last committed chunk, a resumed run continues after it")
+    checkpoint_at: datetime | None = Field(None, description="The time of the last checkpoint")
+    started_at: datetime | None = Field(None, description="The start time of the run")
+    finished_at: datetime | None = Field(None, description="The finish time of the run")
+    created_at: datetime = Field(..., description="The creation time of the run")
+
+# payroll run response schema
+class PayrollRunResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollRunSchema] = Field(..., description="The data of the response")
+
+# ===============================
+# PAYROLL SIMULATION SCHEMA
+# ===============================
+# simulated allowance values
+class AllowanceOverrideSchema(Schema):
+    id: uuid.UUID = Field(..., description="The id of the allowance")
+    percentage: float | None = Field(None, description="The simulated percentage of a percentage allowance")
+    amount: float | None = Field(None, description="The simulated amount of a fixed allowance")
+
+# simulate payroll
+class SimulatePayrollSchema(Schema):
+    salary_increase_percentage: float = Field(0, description="The raise applied to the basic salary of the simulated employees, in percent")
+    employee_ids: list[uuid.UUID] = Field([], description="Only simulate these employees")
+    department_ids: list[uuid.UUID] = Field([], description="Only simulate the employees of these departments")
+    work_location_ids: list[uuid.UUID] = Field([], description="Only simulate the employees of these branches")
+    tax_brackets: list[dict] | None = Field(None, description="Tax brackets (min_salary, max_salary, rate, deduction) replacing the current ones")
+    pension_percentage: float | None = Field(None, description="The pension percentage replacing the current one")
+    allowance_overrides: list[AllowanceOverrideSchema] = Field([], description="Simulated allowance percentages and amounts")
+    details: bool = Field(False, description="Include the per employee deltas")
+
+# payroll simulation schema
+class PayrollSimulationSchema(Schema):
+    employees: int = Field(..., description="The number of simulated employees")
+    baseline: dict = Field(..., description="The totals with the current rules")
+    simulated: dict = Field(..., description="The totals with the simulated rules")
+    delta: dict = Field(..., description="The simulated minus the baseline totals")
+    details: list[dict] = Field(..., description="The per employee gross and net deltas")
+    elapsed_ms: float = Field(..., description="The time taken by the simulation in milliseconds")
+
+# payroll simulation response schema
+class PayrollSimulationResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollSimulationSchema] = Field(..., description="The data of the response")
+
+# ===============================
+# PAYROLL COST ROLLUP SCHEMA
+# ===============================
+# payroll cost rollup schema
+class PayrollCostRollupSchema(Schema):
+    pay_period: date = Field(..., description="The pay period (first day of the month) of the rollup")
+    department_id: uuid.UUID | None = Field(None, description="The id of the department")
+    department_name: str | None = Field(None, description="The name of the department")
+    work_location_id: uuid.UUID | None = Field(None, description="The id of the branch")
+    work_location_name: str | None = Field(None, description="The name of the branch")
+    employee_count: int = Field(..., description="The number of paid employees")
+    basic_salary: float = Field(..., description="The total basic salary")
+    gross_salary: float = Field(..., description="The total gross salary")
+    total_allowance: float = Field(..., description="The total allowance")
+    total_deduction: float = Field(..., description="The total deduction")
+    tax: float = Field(..., description="The total tax")
+    pension: float = Field(..., description="The total pension")
+    net_salary: float = Field(..., description="The total net salary")
+
+# payroll cost rollup response schema
+class PayrollCostRollupResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollCostRollupSchema] = Field(..., description="The data of the response")
+
+# ===============================
+# PAYROLL LINE ITEM SCHEMA
+# ===============================
+# payroll line item summary schema
+class PayrollLineItemSummarySchema(Schema):
+    kind: str = Field(..., description="The kind of the line items (allowance, tax, pension, deduction)")
+    rule_id: str = Field(..., description="The id of the allowance or deduction rule")
+    name: str = Field(..., description="The name of the rule")
+    employee_count: int = Field(..., description="The number of payrolls with this line item")
+    total: float = Field(..., description="The total amount of the line items")
+
+# payroll line item summary response schema
+class PayrollLineItemSummaryResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollLineItemSummarySchema] = Field(..., description="The data of the response")
+
+# ===============================
+# PAYROLL LEDGER SCHEMA
+# ===============================
+# year-to-date payroll ledger schema
+class PayrollLedgerSchema(Schema):
+    employee_id: uuid.UUID = Field(..., description="The id of the employee")
+    year: int = Field(..., description="The year of the ledger")
+    payroll_count: int = Field(..., description="The number of payrolls of the year")
+    gross_salary: float = Field(..., description="The year-to-date gross salary")
+    total_allowance: float = Field(..., description="The year-to-date allowances")
+    total_deduction: float = Field(..., description="The year-to-date deductions")
+    tax: float = Field(..., description="The year-to-date tax")
+    pension: float = Field(..., description="The year-to-date pension")
+    net_salary: float = Field(..., description="The year-to-date net salary")
+
+# year-to-date payroll ledger response schema
+class PayrollLedgerResponseSchema(Schema):
+    status: bool = Field(..., description="The status of the response")
+    status_code: int = Field(..., description="The status code of the response")
+    message: str = Field(..., description="The message of the response")
+    data: list[PayrollLedgerSchema] = Field(..., description="The data of the response")
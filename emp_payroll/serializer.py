@@ -1,8 +1,9 @@
 # ===============================================================
 # PAYROLL SERIALIZER
 # ===============================================================
-from .models import Payroll
-from .schemas import PayrollSchema, EmployeeSchema, DepartmentSchema
+from .models import Payroll, PayrollRun, PayrollCostRollup, PayrollLedger
+from .schemas import PayrollSchema, EmployeeSchema, DepartmentSchema, PayrollRunSchema, PayrollCostRollupSchema, PayrollLedgerSchema
+from django.utils import timezone
 
 # ===============================
 # SERIALIZER FOR PAYROLL
@@ -18,7 +19,7 @@ def serialize_payroll(obj: Payroll):
         department=DepartmentSchema(
                     id=obj.employee_id.department.id,
                     name=obj.employee_id.department.dep_name,
-                    manager_name=obj.employee_id.department.manager_id.full_name if obj.employee_id.department.manager_id else "Not Assiged",
+                    manager_name=obj.employee_id.department.manager.full_name if obj.employee_id.department.manager else "Not Assiged",
                 ),
         allowance=obj.allowance,
         deduction=obj.deduction,
@@ -34,4 +35,83 @@ def serialize_payroll_list(obj: list[Payroll]):
 
 # serialize the single payroll
 def serialize_payroll_single(obj: Payroll):
-    return serialize_payroll(obj).model_dump()
\ No newline at end of file
+    return serialize_payroll(obj).model_dump()
+
+# ===============================
+# SERIALIZER FOR PAYROLL RUN
+# ===============================
+def serialize_payroll_run(obj: PayrollRun):
+    progress = (obj.processed_employees / obj.total_employees * 100) if obj.total_employees else 0.0
+    throughput = 0.0
+    if obj.started_at:
+        elapsed = ((obj.finished_at or timezone.now()) - obj.started_at).total_seconds()
+        throughput = obj.processed_employees / elapsed if elapsed > 0 else 0.0
+
+    return PayrollRunSchema(
+        id=obj.id,
+        payment_date=obj.payment_date,
+        pay_period=obj.pay_period,
+        status=obj.status,
+        total_employees=obj.total_employees,
+        incremental=obj.incremental,
+        shard_by=obj.shard_by,
+        processed_employees=obj.processed_employees,
+        skipped_employees=obj.skipped_employees,
+        recomputed_employees=obj.recomputed_employees,
+        written_payrolls=obj.written_payrolls,
+        unchanged_payrolls=obj.unchanged_payrolls,
+        progress=round(progress, 2),
+        throughput=round(throughput, 2),
+        query_count=obj.query_count,
+        errors=obj.errors,
+        totals=obj.totals,
+        checkpoint_employee_id=obj.checkpoint_employee_id,
+        checkpoint_at=obj.checkpoint_at,
+        started_at=obj.started_at,
+        finished_at=obj.finished_at,
+        created_at=obj.created_at,
+    )
+
+# serialize the single payroll run
+def serialize_payroll_run_single(obj: PayrollRun):
+    return serialize_payroll_run(obj).model_dump()
+
+# ===============================
+# SERIALIZER FOR PAYROLL COST ROLLUP
+# ===============================
+def serialize_payroll_cost_rollup(obj: PayrollCostRollup):
+    return PayrollCostRollupSchema(
+        pay_period=obj.pay_period,
+        department_id=obj.department_id,
+        department_name=obj.department.dep_name if obj.department else None,
+        work_location_id=obj.work_location_id,
+        work_location_name=obj.work_location.branch_name if obj.work_location else None,
+        employee_count=obj.employee_count,
+        basic_salary=obj.basic_salary,
+        gross_salary=obj.gross_salary,
+        total_allowance=obj.total_allowance,
+        total_deduction=obj.total_deduction,
+        tax=obj.tax,
+        pension=obj.pension,
+        net_salary=obj.net_salary,
+    )
+
+# serialize the list of payroll cost rollups
+def serialize_payroll_cost_rollup_list(obj: list[PayrollCostRollup]):
+    return [serialize_payroll_cost_rollup(item) for item in obj]
+
+# ===============================
+# SERIALIZER FOR PAYROLL LEDGER
+# ===============================
+def serialize_payroll_ledger(obj: PayrollLedger):
+    return PayrollLedgerSchema(
+        employee_id=obj.employee_id,
+        year=obj.year,
+        payroll_count=obj.payroll_count,
+        gross_salary=obj.gross_salary,
+        total_allowance=obj.total_allowance,
+        total_deduction=obj.total_deduction,
+        tax=obj.tax,
+        pension=obj.pension,
+        net_salary=obj.net_salary,
+    )
@@ -1,7 +1,7 @@
 # ===============================================================
 # VALIDATION FOR PAYROLL
 # ===============================================================
-from schemas import CreatePayrollSchema
+from .schemas import CreatePayrollSchema
 from .models import Payroll
 from employees.models import Employee
 from ninja.errors import ValidationError
@@ -210,16 +210,19 @@ def validate_payroll_period(payment_date: date) -> str:
     """
     Validate payroll period.
 
+    Payrolls are unique per employee and pay period, so a re-run of a
+    period rewrites it instead of duplicating it; this only reports that
+    the period already has payrolls, through the pay_period index.
+
     Args:
         payment_date: Payment date.
-        db_name: Database alias.
 
     Returns:
         str: Empty if valid, error message if invalid.
     """
     # Check if payroll already exists for this period
-    existing_payroll = Payroll.objects.filter(payment_date=payment_date).exists()
-    if existing_payroll:
-        return f"Payroll already exists for {payment_date}"
+    pay_period = date(payment_date.year, payment_date.month, 1)
+    if Payroll.objects.filter(pay_period=pay_period).exists():
+        return f"Payroll already exists for {pay_period:%Y-%m}"
 
     return ""
@@ -23,7 +23,12 @@ from employees.schemas import EmployeeResponseSchema, CreateAndUpdateEmployeeReq
 # ===============================
 # SERIALIZERS
 # ===============================
-from employees.serializers import serialize_employee_list, serialize_employee_single
+from employees.serializers import serialize_employee, serialize_employee_list, serialize_employee_single
+
+# ===============================
+# UTILS
+# ===============================
+from utility.streaming import stream_ndjson, STREAM_FORMATS
 
 # ===============================
 # ROUTERS
@@ -156,12 +161,13 @@ def create_employee(request, employee: CreateAndUpdateEmployeeRequestSchema):
         return EmployeeResponseSchema(status=False, status_code=500, message=str(e), data=[])
 
 
-# get all employees
+# get all employees (stream=ndjson streams one employee per line)
 @employee_router.get('/', response=EmployeeResponseSchema)
-def get_all_employees(request):
+def get_all_employees(request, stream: str = None):
     try:
-        employees = Employee.objects.filter(is_deleted=False)
-        print(employees)
+        employees = Employee.objects.filter(is_deleted=False).select_related("department", "department__manager", "work_location")
+        if stream in STREAM_FORMATS:
+            return stream_ndjson(employees, serialize_employee)
         serialized_employees = serialize_employee_list(employees)
         return EmployeeResponseSchema(status=True, status_code=200, message="Employees fetched successfully", data=serialized_employees)
     except Exception as e:
@@ -42,7 +42,7 @@ def serialize_employee(employee: Employee):
                 department=DepartmentDataSchema(
                     id=employee.department.id,
                     name=employee.department.dep_name,
-                    manager_name=employee.department.manager_id.full_name if employee.department.manager_id else "",
+                    manager_name=employee.department.manager.full_name if employee.department.manager else "",
                     is_active=employee.department.is_active,
                 ),
                 employee_type=employee.employee_type,
@@ -2,6 +2,8 @@
 # ATTENDANCE UTILS
 # ===============================================================
 from datetime import datetime
+
+from attendance.schemas import STATUS_FLAGS
 # ===============================================================
 # HARCODE FOR ATTENDANCE CHECK IN AND CHECK OUT
 # ===============================================================
@@ -26,7 +28,7 @@ def check_in_status(data: datetime):
     return status
 
 def check_out_status(data: datetime):
-    if data > CHECK_OUT_TIME:
+    if data < CHECK_OUT_TIME:
         status = {
             "early_out": True,
             "on_time_out": False,
@@ -37,4 +39,14 @@ def check_out_status(data: datetime):
             "on_time_out": True,
         }
 
-    return status
\ No newline at end of file
+    return status
+
+def get_attendance_status(attendance):
+    # a fresh dict per record, built from its status columns
+    return {
+        **STATUS_FLAGS,
+        "late_in": attendance.late_in,
+        "on_time_in": attendance.on_time_in,
+        "early_out": attendance.early_out,
+        "on_time_out": attendance.on_time_out,
+    }
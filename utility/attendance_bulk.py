@@ -0,0 +1,123 @@
+# ===============================================================
+# BULK ATTENDANCE
+# ===============================================================
+# Check-ins uploaded in bursts by badge terminals and kiosks. A batch costs
+# a fixed number of queries whatever its size: one for the employees and
+# one insert, which skips the employees that already checked in that day
+# and returns the records it created.
+from datetime import date
+
+from django.db import connection, transaction
+
+from attendance.models import Attendance
+from employees.models import Employee
+from utility.attendance import check_in_status
+from utility.attendance_summary import record_check_ins
+
+# rows per INSERT statement of the bulk check-in
+ATTENDANCE_BULK_BATCH_SIZE = 1000
+
+# ===============================
+# INSERT
+# ===============================
+def insert_attendances(attendances: list[Attendance], batch_size: int = ATTENDANCE_BULK_BATCH_SIZE):
+    """
+    Insert attendance records, skipping the employees that already have one
+    on the day.
+
+    The records are written with INSERT ... ON CONFLICT DO NOTHING RETURNING
+    against the unique (employee, attendance date) constraint: concurrent
+    check-ins of the same employee cannot both be recorded, and the records
+    actually created are known without a separate lookup.
+
+    Args:
+        attendances: Unsaved Attendance objects.
+        batch_size: The number of rows per INSERT statement.
+
+    Returns:
+        set: The ids of the records created.
+    """
+    meta = Attendance._meta
+    fields = meta.concrete_fields
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {table} ({columns}) VALUES {values} ON CONFLICT ({employee}, {date}) DO NOTHING RETURNING {pk}"
+    placeholders = "(" + ", ".join(["%s"] * len(fields)) + ")"
+    batch_size = max(1, min(batch_size, connection.ops.bulk_batch_size(fields, attendances)))
+
+    created = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(attendances), batch_size):
+            batch = attendances[start:start + batch_size]
+            params = [
+                field.get_db_prep_save(field.pre_save(attendance, True), connection)
+                for attendance in batch for field in fields
+            ]
+            cursor.execute(sql.format(
+                table=quote(meta.db_table),
+                columns=", ".join(quote(field.column) for field in fields),
+                values=", ".join([placeholders] * len(batch)),
+                employee=quote(meta.get_field("employee_id").column),
+                date=quote(meta.get_field("attendance_date").column),
+                pk=quote(meta.pk.column),
+            ), params)
+            created.update(meta.pk.to_python(row[0]) for row in cursor.fetchall())
+    return created
+
+def new_check_in(employee_id, attendance_date: date, check_in_time):
+    return Attendance(
+        employee_id_id=employee_id,
+        attendance_date=attendance_date,
+        check_in_time=check_in_time,
+        check_out_time=None,
+        **check_in_status(check_in_time),
+    )
+
+# ===============================
+# BULK CHECK-IN
+# ===============================
+def bulk_check_in(check_ins: list, attendance_date: date):
+    """
+    Record the check-ins of many employees on one day.
+
+    Punches buffered by a terminal can contain the same employee twice: the
+    earliest check-in of the batch is kept and the others are rejected like
+    employees that already checked in that day.
+
+    Args:
+        check_ins: Objects with an 'employee_id' and a 'check_in_time'.
+        attendance_date: The day of the check-ins.
+
+    Returns:
+        tuple: (results, created) where results holds one dict per check-in,
+        in request order, with 'employee_id', 'success', 'message' and the
+        'attendance_id' of a created record.
+    """
+    earliest = {}
+    for index, check_in in enumerate(check_ins):
+        current = earliest.get(check_in.employee_id)
+        if current is None or check_in.check_in_time < check_ins[current].check_in_time:
+            earliest[check_in.employee_id] = index
+
+    # unknown employees would fail the whole insert on the foreign key
+    employee_ids = set(Employee.objects.filter(id__in=list(earliest)).values_list("id", flat=True))
+    attendances = {
+        employee_id: new_check_in(employee_id, attendance_date, check_ins[index].check_in_time)
+        for employee_id, index in earliest.items() if employee_id in employee_ids
+    }
+    with transaction.atomic():
+        created = insert_attendances(list(attendances.values()))
+        record_check_ins([attendance for attendance in attendances.values() if attendance.id in created])
+
+    results = []
+    for index, check_in in enumerate(check_ins):
+        result = {"employee_id": check_in.employee_id, "success": False, "attendance_id": None}
+        attendance = attendances.get(check_in.employee_id)
+        if check_in.employee_id not in employee_ids:
+            result["message"] = "Employee not found"
+        elif earliest[check_in.employee_id] != index or attendance.id not in created:
+            result["message"] = "Attendance record already exists"
+        else:
+            result.update(success=True, message="Attendance record created", attendance_id=attendance.id)
+        results.append(result)
+
+    return results, len(created)
@@ -0,0 +1,284 @@
+# ===============================================================
+# ATTENDANCE LOG IMPORT
+# ===============================================================
+# Daily punch logs exported by the biometric devices of the branches, as
+# CSV or NDJSON files. A file is parsed as a stream, its rows are validated
+# in batches against the employee codes, loaded into the attendance_punches
+# staging table (COPY on PostgreSQL, bulk_create elsewhere) and merged into
+# the attendances: the first punch of an employee on a day is the check-in
+# and the last one the check-out.
+import csv
+import io
+import json
+import uuid
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendancePunch
+from employees.models import Employee
+from utility.attendance import check_in_status, check_out_status
+from utility.attendance_summary import rebuild_attendance_summaries
+
+# punches validated and loaded per batch
+ATTENDANCE_IMPORT_BATCH_SIZE = getattr(settings, "ATTENDANCE_IMPORT_BATCH_SIZE", 10000)
+
+# rejected rows kept in an import report, the others are only counted
+ATTENDANCE_IMPORT_REPORT_LIMIT = getattr(settings, "ATTENDANCE_IMPORT_REPORT_LIMIT", 1000)
+
+# supported log file formats
+IMPORT_FORMATS = ["csv", "ndjson"]
+
+# ===============================
+# PARSING
+# ===============================
+def get_import_format(filename: str, format: str = None):
+    format = format or filename.rsplit(".", 1)[-1].lower()
+    if format == "jsonl":
+        format = "ndjson"
+    if format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported log format '{format}', expected one of {', '.join(IMPORT_FORMATS)}")
+    return format
+
+def iter_log_records(stream, format: str):
+    """
+    Read the records of a device log one line at a time.
+
+    Args:
+        stream: A binary file object.
+        format: 'csv' (with a header line) or 'ndjson'.
+
+    Yields:
+        tuple: (line number, record dict); a line that is not valid JSON
+        yields None as its record.
+    """
+    lines = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if format == "csv":
+        reader = csv.DictReader(lines)
+        for record in reader:
+            yield reader.line_num, record
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield line_number, record if isinstance(record, dict) else None
+
+def parse_punch(record: dict, employee_ids: dict, ambiguous_codes: set = frozenset()):
+    """
+    Validate a log record.
+
+    A record has an 'employee_code' and either a 'timestamp' (ISO date and
+    time) or separate 'date' and 'time' fields.
+
+    Returns:
+        tuple: (employee id, punch date, punch time).
+
+    Raises:
+        ValueError: The reason the record is rejected.
+    """
+    if record is None:
+        raise ValueError("Invalid record")
+
+    employee_code = str(record.get("employee_code") or "").strip()
+    if not employee_code:
+        raise ValueError("Missing employee code")
+    if employee_code in ambiguous_codes:
+        raise ValueError(f"Employee code {employee_code} is shared by several employees")
+    employee_id = employee_ids.get(employee_code)
+    if employee_id is None:
+        raise ValueError(f"Unknown employee code {employee_code}")
+
+    try:
+        if record.get("timestamp"):
+            punched_at = datetime.fromisoformat(str(record["timestamp"]).strip())
+            return employee_id, punched_at.date(), punched_at.time().replace(microsecond=0)
+        return employee_id, date.fromisoformat(str(record["date"]).strip()), time.fromisoformat(str(record["time"]).strip())
+    except (KeyError, TypeError, ValueError):
+        raise ValueError("Invalid punch timestamp")
+
+def load_employee_ids():
+    """
+    Map the employee codes to the employees that can punch.
+
+    Employee codes are not unique: a code shared by several employees is
+    left out of the map and returned apart, its punches are rejected
+    instead of being recorded for one of them.
+
+    Returns:
+        tuple: (employee code -> id, set of ambiguous codes).
+    """
+    employee_ids, ambiguous_codes = {}, set()
+    for employee_code, employee_id in Employee.objects.filter(is_deleted=False).exclude(employee_code="").values_list("employee_code", "id"):
+        if employee_code in employee_ids or employee_code in ambiguous_codes:
+            employee_ids.pop(employee_code, None)
+            ambiguous_codes.add(employee_code)
+        else:
+            employee_ids[employee_code] = employee_id
+    return employee_ids, ambiguous_codes
+
+# ===============================
+# STAGING
+# ===============================
+def copy_punches(punches: list[AttendancePunch]):
+    """
+    Load punches into the staging table, with COPY on PostgreSQL.
+    """
+    if connection.vendor != "postgresql":
+        AttendancePunch.objects.bulk_create(punches, batch_size=ATTENDANCE_IMPORT_BATCH_SIZE)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    now = timezone.now().isoformat()
+    for punch in punches:
+        writer.writerow([punch.id, punch.batch_id, punch.employee_id, punch.punch_date.isoformat(), punch.punch_time.isoformat(), now])
+    buffer.seek(0)
+
+    fields = ["id", "batch_id", "employee", "punch_date", "punch_time", "created_at"]
+    columns = ", ".join(connection.ops.quote_name(AttendancePunch._meta.get_field(field).column) for field in fields)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {connection.ops.quote_name(AttendancePunch._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def merge_punches(batch_id, chunk_size: int = ATTENDANCE_IMPORT_BATCH_SIZE):
+    """
+    Merge the staged punches of a batch into the attendances.
+
+    The punches are grouped per employee and day in the database. A day
+    that already has an attendance keeps its earlier check-in and later
+    check-out, and the rows are written with one upsert per chunk.
+
+    Returns:
+        int: The number of attendances created or updated.
+    """
+    days = (
+        AttendancePunch.objects.filter(batch_id=batch_id)
+        .values("employee_id", "punch_date")
+        .annotate(first=Min("punch_time"), last=Max("punch_time"))
+        .order_by("punch_date", "employee_id")
+    )
+
+    merged = 0
+    chunk = []
+    for day in days.iterator(chunk_size=chunk_size):
+        chunk.append(day)
+        if len(chunk) >= chunk_size:
+            merged += merge_punch_days(chunk)
+            chunk = []
+    if chunk:
+        merged += merge_punch_days(chunk)
+    return merged
+
+def merge_punch_days(days: list[dict]):
+    existing = {
+        (attendance.employee_id_id, attendance.attendance_date): attendance
+        for attendance in Attendance.objects.filter(
+            employee_id__in={day["employee_id"] for day in days},
+            attendance_date__in={day["punch_date"] for day in days},
+        )
+    }
+
+    now = timezone.now()
+    attendances = []
+    for day in days:
+        current = existing.get((day["employee_id"], day["punch_date"]))
+        punches = [day["first"], day["last"]]
+        if current is not None:
+            punches += [value for value in (current.check_in_time, current.check_out_time) if value is not None]
+        check_in, check_out = min(punches), max(punches)
+        if check_out == check_in:
+            check_out = current.check_out_time if current is not None else None
+
+        flags = check_in_status(check_in)
+        flags.update(check_out_status(check_out) if check_out is not None else {"early_out": False, "on_time_out": False})
+        attendances.append(Attendance(
+            id=current.id if current is not None else uuid.uuid4(),
+            employee_id_id=day["employee_id"],
+            attendance_date=day["punch_date"],
+            check_in_time=check_in,
+            check_out_time=check_out,
+            **flags,
+            created_at=current.created_at if current is not None else now,
+            updated_at=now,
+        ))
+
+    Attendance.objects.bulk_create(
+        attendances,
+        update_conflicts=True,
+        unique_fields=["employee_id", "attendance_date"],
+        update_fields=["check_in_time", "check_out_time", "late_in", "on_time_in", "early_out", "on_time_out", "updated_at"],
+    )
+    return len(attendances)
+
+# ===============================
+# IMPORT
+# ===============================
+def import_attendance_log(
+    stream,
+    format: str,
+    batch_size: int = ATTENDANCE_IMPORT_BATCH_SIZE,
+    report_limit: int = ATTENDANCE_IMPORT_REPORT_LIMIT,
+    on_reject=None,
+):
+    """
+    Import a device punch log into the attendances.
+
+    Args:
+        stream: The log as a binary file object, read line by line.
+        format: 'csv' or 'ndjson'.
+        batch_size: The number of punches validated and loaded at a time.
+        report_limit: The number of rejected rows kept in the report, the
+            following ones are only counted so a malformed log is never
+            held in memory.
+        on_reject: Optional function called with every rejected row as it
+            is read, e.g. to write a complete report.
+
+    Returns:
+        dict: The import report: 'batch_id', the number of 'rows' read,
+        'punches' loaded, 'rejected' rows and 'attendances' merged, and
+        'rejected_rows' with the 'line', 'reason' and 'record' of the first
+        rejected rows.
+    """
+    batch_id = uuid.uuid4()
+    employee_ids, ambiguous_codes = load_employee_ids()
+    report = {"batch_id": batch_id, "rows": 0, "punches": 0, "rejected": 0, "attendances": 0, "rejected_rows": []}
+
+    try:
+        punches = []
+        for line, record in iter_log_records(stream, format):
+            report["rows"] += 1
+            try:
+                employee_id, punch_date, punch_time = parse_punch(record, employee_ids, ambiguous_codes)
+            except ValueError as e:
+                report["rejected"] += 1
+                rejected = {"line": line, "reason": str(e), "record": record or {}}
+                if len(report["rejected_rows"]) < report_limit:
+                    report["rejected_rows"].append(rejected)
+                if on_reject is not None:
+                    on_reject(rejected)
+                continue
+            punches.append(AttendancePunch(batch_id=batch_id, employee_id=employee_id, punch_date=punch_date, punch_time=punch_time))
+            if len(punches) >= batch_size:
+                copy_punches(punches)
+                report["punches"] += len(punches)
+                punches = []
+        if punches:
+            copy_punches(punches)
+            report["punches"] += len(punches)
+
+        with transaction.atomic():
+            report["attendances"] = merge_punches(batch_id, batch_size)
+            # merged days can change existing attendances, rebuild their months
+            for month in AttendancePunch.objects.filter(batch_id=batch_id).dates("punch_date", "month"):
+                rebuild_attendance_summaries(month)
+    finally:
+        AttendancePunch.objects.filter(batch_id=batch_id).delete()
+
+    return report
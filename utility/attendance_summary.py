@@ -0,0 +1,120 @@
+# ===============================================================
+# ATTENDANCE MONTHLY SUMMARIES
+# ===============================================================
+# Days present, late check-ins, early check-outs and hours worked of every
+# employee per month. Check-ins and check-outs add to the summary of their
+# month with F() updates, and a month can be rebuilt from its attendances
+# with one GROUP BY, so monthly reports never read the attendances.
+from datetime import date, datetime
+
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from attendance.models import Attendance, AttendanceMonthlySummary
+
+def get_summary_month(day: date):
+    return day.replace(day=1)
+
+def get_seconds_worked(check_in_time, check_out_time):
+    if check_in_time is None or check_out_time is None:
+        return 0
+    worked = datetime.combine(date.min, check_out_time) - datetime.combine(date.min, check_in_time)
+    return max(0, int(worked.total_seconds()))
+
+def ensure_summaries(employee_ids, month: date):
+    AttendanceMonthlySummary.objects.bulk_create(
+        [AttendanceMonthlySummary(employee_id=employee_id, month=month) for employee_id in employee_ids],
+        ignore_conflicts=True,
+    )
+
+# ===============================
+# INCREMENTAL UPDATES
+# ===============================
+def record_check_ins(attendances: list[Attendance]):
+    """
+    Add newly created check-ins to the summaries of their month.
+
+    The employees are updated with one statement per month and check-in
+    status, whatever the number of attendances.
+    """
+    groups = {}
+    for attendance in attendances:
+        key = (get_summary_month(attendance.attendance_date), attendance.late_in)
+        groups.setdefault(key, []).append(attendance.employee_id_id)
+
+    for (month, late_in), employee_ids in groups.items():
+        ensure_summaries(employee_ids, month)
+        counter = "late_in_count" if late_in else "on_time_in_count"
+        AttendanceMonthlySummary.objects.filter(employee_id__in=employee_ids, month=month).update(
+            days_present=F("days_present") + 1,
+            **{counter: F(counter) + 1},
+            updated_at=timezone.now(),
+        )
+
+def record_check_out(attendance: Attendance):
+    """
+    Add a check-out and the time worked on the day to the summary of its
+    month.
+    """
+    month = get_summary_month(attendance.attendance_date)
+    ensure_summaries([attendance.employee_id_id], month)
+    counter = "early_out_count" if attendance.early_out else "on_time_out_count"
+    AttendanceMonthlySummary.objects.filter(employee_id=attendance.employee_id_id, month=month).update(
+        seconds_worked=F("seconds_worked") + get_seconds_worked(attendance.check_in_time, attendance.check_out_time),
+        **{counter: F(counter) + 1},
+        updated_at=timezone.now(),
+    )
+
+# ===============================
+# REBUILD
+# ===============================
+def rebuild_attendance_summaries(month: date):
+    """
+    Rebuild the summaries of a month from its attendances.
+
+    Args:
+        month: Any day of the month to rebuild.
+
+    Returns:
+        int: The number of summary rows written.
+    """
+    month = get_summary_month(month)
+    next_month = date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    checked_out = Q(check_in_time__isnull=False, check_out_time__isnull=False)
+    groups = (
+        Attendance.objects
+        .filter(attendance_date__gte=month, attendance_date__lt=next_month)
+        .values("employee_id")
+        .annotate(
+            days_present=Count("id", filter=Q(check_in_time__isnull=False)),
+            late_in_count=Count("id", filter=Q(check_in_time__isnull=False, late_in=True)),
+            on_time_in_count=Count("id", filter=Q(check_in_time__isnull=False, on_time_in=True)),
+            early_out_count=Count("id", filter=checked_out & Q(early_out=True)),
+            on_time_out_count=Count("id", filter=checked_out & Q(on_time_out=True)),
+            worked=Sum(
+                ExpressionWrapper(F("check_out_time") - F("check_in_time"), output_field=DurationField()),
+                filter=checked_out & Q(check_out_time__gt=F("check_in_time")),
+            ),
+        )
+        .order_by()
+    )
+
+    summaries = [
+        AttendanceMonthlySummary(
+            employee_id=group["employee_id"],
+            month=month,
+            days_present=group["days_present"],
+            late_in_count=group["late_in_count"],
+            on_time_in_count=group["on_time_in_count"],
+            early_out_count=group["early_out_count"],
+            on_time_out_count=group["on_time_out_count"],
+            seconds_worked=int(group["worked"].total_seconds()) if group["worked"] else 0,
+        )
+        for group in groups
+    ]
+
+    with transaction.atomic():
+        AttendanceMonthlySummary.objects.filter(month=month).delete()
+        AttendanceMonthlySummary.objects.bulk_create(summaries)
+    return len(summaries)
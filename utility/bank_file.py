@@ -0,0 +1,157 @@
+# ===============================================================
+# BANK TRANSFER FILE
+# ===============================================================
+# Net pay transfer file of a pay period, one batch per salary currency.
+# Every batch has a header, one payment record per employee and a trailer
+# with the record count, the total amount, a hash total of the account
+# numbers and a SHA-256 of the payment records; the file ends with a
+# trailer covering every batch. Totals and checksums are updated while
+# the records are streamed, only the needed columns are read with
+# .values_list().iterator().
+import csv
+import hashlib
+from datetime import date
+from decimal import Decimal
+
+from django.http import StreamingHttpResponse
+
+from emp_payroll.models import Payroll
+from utility.streaming import Echo
+
+# rows fetched per round trip while generating the file
+BANK_FILE_CHUNK_SIZE = 5000
+
+# supported values of the 'format' query parameter
+BANK_FILE_FORMATS = ["fixed", "csv"]
+
+# hash totals keep the last 15 digits
+HASH_TOTAL_MODULUS = 10 ** 15
+
+# fixed-width layout of every record type: (width, align) per field, see
+# format_fixed_width for the alignments. Currency fields are as wide as
+# Employee.currency_of_salary (5 characters).
+FIXED_WIDTH_LAYOUT = {
+    # record type, currency, pay period, batch number
+    "H": [(1, "<"), (5, "<"), (8, "<"), (6, ">")],
+    # record type, account number, account holder, amount in cents, reference
+    "D": [(1, "<"), (34, "<"), (35, "~"), (15, ">"), (36, "<")],
+    # record type, currency, record count, total in cents, hash total, skipped, sha256
+    "T": [(1, "<"), (5, "<"), (8, ">"), (18, ">"), (15, ">"), (8, ">"), (64, "<")],
+    # record type, batch count, record count, skipped, sha256
+    "F": [(1, "<"), (6, ">"), (10, ">"), (8, ">"), (64, "<")],
+}
+
+# ===============================
+# RECORDS
+# ===============================
+def to_cents(amount) -> int:
+    return int((Decimal(amount) * 100).quantize(Decimal("1")))
+
+def account_hash(account_number: str) -> int:
+    digits = "".join(character for character in account_number if character.isdigit())
+    return int(digits) % HASH_TOTAL_MODULUS if digits else 0
+
+def iter_bank_records(pay_period: date, chunk_size: int = BANK_FILE_CHUNK_SIZE):
+    """
+    Yield the records of the transfer file of a pay period.
+
+    Payrolls are read ordered by currency, so a batch is closed as soon as
+    the next currency starts. Payrolls without a bank account or with no
+    positive net pay are skipped and counted in the trailers.
+
+    Yields:
+        list: The fields of a record, the first one is the record type
+        (H header, D payment, T batch trailer, F file trailer).
+    """
+    payrolls = (
+        Payroll.objects
+        .filter(pay_period=pay_period)
+        .order_by("employee_id__currency_of_salary", "employee_id")
+        .values_list(
+            "employee_id__currency_of_salary", "employee_id", "employee_id__full_name",
+            "employee_id__bank_account_number", "net_salary",
+        )
+    )
+
+    file_digest = hashlib.sha256()
+    file_records, file_skipped, batch_number = 0, 0, 0
+    batch = None
+
+    def close_batch():
+        return ["T", batch["currency"], batch["records"], batch["total"], batch["hash_total"], batch["skipped"], batch["digest"].hexdigest()]
+
+    for currency, employee_id, full_name, account_number, net_salary in payrolls.iterator(chunk_size=chunk_size):
+        if batch is None or currency != batch["currency"]:
+            if batch is not None:
+                yield close_batch()
+            batch_number += 1
+            batch = {"currency": currency, "records": 0, "total": 0, "hash_total": 0, "skipped": 0, "digest": hashlib.sha256()}
+            yield ["H", currency, pay_period.strftime("%Y%m%d"), batch_number]
+
+        amount = to_cents(net_salary)
+        if not account_number or amount <= 0:
+            batch["skipped"] += 1
+            file_skipped += 1
+            continue
+
+        record = ["D", account_number, full_name, amount, str(employee_id)]
+        line = "|".join(str(field) for field in record).encode()
+        batch["digest"].update(line)
+        file_digest.update(line)
+        batch["records"] += 1
+        batch["total"] += amount
+        batch["hash_total"] = (batch["hash_total"] + account_hash(account_number)) % HASH_TOTAL_MODULUS
+        file_records += 1
+        yield record
+
+    if batch is not None:
+        yield close_batch()
+    yield ["F", batch_number, file_records, file_skipped, file_digest.hexdigest()]
+
+# ===============================
+# FORMATS
+# ===============================
+def format_fixed_width(record: list):
+    """
+    Format a record with FIXED_WIDTH_LAYOUT: '>' fields are numbers padded
+    with zeros, '<' fields are left aligned text and '~' fields are left
+    aligned text cut to their width (names).
+
+    Raises:
+        ValueError: If a field other than a '~' one does not fit its width,
+        cutting an amount, a total or an account number would change the
+        payments silently.
+    """
+    fields = []
+    for value, (width, align) in zip(record, FIXED_WIDTH_LAYOUT[record[0]]):
+        value = str(value)
+        if align == "~":
+            value = value[:width]
+        elif len(value) > width:
+            raise ValueError(f"Value {value} does not fit the {width} characters of a {record[0]} record field")
+        fields.append(value.rjust(width, "0") if align == ">" else value.ljust(width))
+    return "".join(fields) + "\r\n"
+
+def generate_bank_file(pay_period: date, file_format: str = "fixed"):
+    """
+    Stream the transfer file of a pay period.
+
+    Args:
+        pay_period: The first day of the month of the payrolls.
+        file_format: 'fixed' (fixed-width records) or 'csv'.
+
+    Returns:
+        StreamingHttpResponse: The transfer file.
+    """
+    records = iter_bank_records(pay_period)
+    if file_format == "csv":
+        writer = csv.writer(Echo())
+        lines = (writer.writerow(record) for record in records)
+        content_type, extension = "text/csv", "csv"
+    else:
+        lines = (format_fixed_width(record) for record in records)
+        content_type, extension = "text/plain", "txt"
+
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="bank_transfer_{pay_period:%Y-%m}.{extension}"'
+    return response
@@ -2,20 +2,23 @@
 # EMPLOYEE UTILS
 # ===============================================================
 
-from allowance.models import Allowance
-from deduction.models import Deduction
+from utility.rule_cache import get_rules
 import uuid
 
 # get allowance data by id
 def get_allowance_data_by_id(data: list[uuid.UUID]):
     if data:
-        return Allowance.objects.filter(id__in=data, is_deleted=False)
+        rules = get_rules()
+        ids = {str(allowance_id) for allowance_id in data} & rules["allowances"].keys()
+        # dict lookups by id, sorted newest first like the model
+        return [rules["allowances"][allowance_id] for allowance_id in sorted(ids, key=rules["allowance_positions"].get)]
     return []
 
 # get deduction data by id
 def get_deduction_data_by_id(data: list[str]):
     if data:
-        other_deduction = Deduction.objects.filter(type="Other").first()
-        deduction_data = [d for d in other_deduction.data if d['id'] in data]
-        return deduction_data
-    return []
\ No newline at end of file
+        other_deductions = get_rules()["other_deductions"]
+        rows = [other_deductions[deduction_id] for deduction_id in {str(deduction_id) for deduction_id in data} if deduction_id in other_deductions]
+        # in the order of the Other deduction data
+        return [d for _, d in sorted(rows, key=lambda row: row[0])]
+    return []
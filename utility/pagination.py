@@ -0,0 +1,76 @@
+# ===============================================================
+# KEYSET PAGINATION UTILS
+# ===============================================================
+# Cursor pagination on (payment_date, id), newest first. A page is read
+# with "WHERE (payment_date, id) < cursor ORDER BY payment_date DESC, id
+# DESC LIMIT n", which an index on the ordering columns answers in the same
+# time for the first and the millionth page, unlike OFFSET.
+import base64
+import json
+import uuid
+from datetime import date
+
+from django.db.models import F, Field, Func, UUIDField, Value
+
+# number of rows of a page when no limit is given
+DEFAULT_PAGE_SIZE = 50
+
+# largest accepted page size
+MAX_PAGE_SIZE = 500
+
+class InvalidCursorError(ValueError):
+    pass
+
+# ===============================
+# CURSOR
+# ===============================
+def encode_cursor(payment_date: date, row_id: uuid.UUID):
+    payload = json.dumps([payment_date.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        payment_date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return date.fromisoformat(payment_date), uuid.UUID(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursorError("Invalid cursor")
+
+# ===============================
+# PAGE
+# ===============================
+class Row(Func):
+    # SQL row value "(a, b)", compared element by element like a tuple
+    template = "(%(expressions)s)"
+    output_field = Field()
+
+def keyset_page(queryset, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Read one page of a queryset ordered by (payment_date, id) descending.
+
+    Args:
+        queryset: The filtered queryset, it must have payment_date and id.
+        cursor: The next_cursor of the previous page, None for the first page.
+        limit: The page size, capped at MAX_PAGE_SIZE.
+
+    Returns:
+        tuple: The rows of the page and the cursor of the next page (None
+        on the last page).
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    queryset = queryset.order_by("-payment_date", "-id")
+    if cursor:
+        payment_date, row_id = decode_cursor(cursor)
+        # the row comparison is the start point of the ordered index scan,
+        # the payment_date bound lets planners without row comparison
+        # support still use a range on the index
+        queryset = queryset.alias(page_key=Row(F("payment_date"), F("id"))).filter(
+            payment_date__lte=payment_date,
+            page_key__lt=Row(Value(payment_date), Value(row_id, output_field=UUIDField())),
+        )
+
+    # one extra row tells whether there is a next page
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].payment_date, rows[-1].id)
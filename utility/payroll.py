@@ -3,49 +3,125 @@
 # ===============================================================
 
 from deduction.models import Deduction
-from allowance.models import Allowance
+from utility.rule_cache import get_rules, get_cached_allowance, get_cached_deduction
+from array import array
+from bisect import bisect_right
+from datetime import date
+import hashlib
 import uuid
 
-def get_tax(tax_data: dict, salary: float):
-    for data in tax_data:
+# ===============================
+# COMPILED TAX BRACKETS
+# ===============================
+# brackets are stored with whole unit bounds (0-600, 601-1650, ...), so a
+# gap of up to one unit between two brackets is not a hole in the table
+TAX_BRACKET_GAP_TOLERANCE = 1.0
+
+class TaxBracketError(ValueError):
+    pass
+
+# compiled tables of the Tax rows keyed by row id, see get_tax_table
+_tax_tables = {}
+
+def parse_max_salary(max_val):
+    if max_val is None:
+        return float("inf")
+    if isinstance(max_val, str) and max_val.strip().lower() in ["unlimited", ""]:
+        return float("inf")
+    return float(max_val)
+
+def compile_tax_brackets(tax_data: list[dict]):
+    """
+    Compile the Tax deduction data into a bracket table.
+
+    Args:
+        tax_data: The data list of the Tax deduction.
+
+    Returns:
+        dict: 'lower' and 'upper' bounds as contiguous float arrays sorted
+        by lower bound, and the matching 'brackets' dicts.
+
+    Raises:
+        TaxBracketError: If a bracket is invalid, overlaps another one or
+        leaves a gap in the table.
+    """
+    parsed = []
+    for index, data in enumerate(tax_data or []):
         try:
             min_salary = float(data["min_salary"])
-        except (ValueError, TypeError):
-            continue  # skip if invalid
-
-        max_val = data.get("max_salary")
-
-        if max_val is None:
-            max_salary = float("inf")
-        elif isinstance(max_val, str) and max_val.lower() in ["UNLIMITED"]:
-            max_salary = float("inf")
-        else:
-            try:
-                max_salary = float(max_val)
-            except (ValueError, TypeError):
-                continue  # skip if invalid
-
-        if min_salary <= salary <= max_salary:
-            return data
-    return None
-
-      
-# get deductions
-def get_deductions(deduction: dict, salary: float):
-    # ===============================
-    # DEDUCTIONS
-    # ===============================
-    # get tax and pension deductions
-    deductions = Deduction.objects.filter(is_active=True, type__in=["Tax", "Pension"])
-    deduction_tax = deductions.get(type="Tax")
-    deduction_pension = deductions.get(type="Pension")
+            max_salary = parse_max_salary(data.get("max_salary"))
+        except (KeyError, ValueError, TypeError):
+            raise TaxBracketError(f"Tax bracket {index} has an invalid salary range")
+        if max_salary < min_salary:
+            raise TaxBracketError(f"Tax bracket {index} maximum salary is below its minimum salary")
+        parsed.append((min_salary, max_salary, data))
+
+    parsed.sort(key=lambda item: item[0])
+    for previous, current in zip(parsed, parsed[1:]):
+        if current[0] < previous[1]:
+            raise TaxBracketError(f"Tax brackets {previous[2].get('name', previous[0])} and {current[2].get('name', current[0])} overlap")
+        if current[0] - previous[1] > TAX_BRACKET_GAP_TOLERANCE:
+            raise TaxBracketError(f"Gap between tax brackets {previous[2].get('name', previous[0])} and {current[2].get('name', current[0])}")
+
+    return {
+        "lower": array("d", [item[0] for item in parsed]),
+        "upper": array("d", [item[1] for item in parsed]),
+        "brackets": [item[2] for item in parsed],
+    }
+
+def find_tax_bracket(table: dict, salary: float):
+    salary = float(salary)
+    lower, upper = table["lower"], table["upper"]
+    index = bisect_right(lower, salary) - 1
+    if index < 0:
+        return None
+    # a salary sitting on a shared bound belongs to the lower bracket
+    if index > 0 and salary == lower[index] and salary <= upper[index - 1]:
+        index -= 1
+    if salary > upper[index]:
+        return None
+    return table["brackets"][index]
+
+# get the compiled table of a Tax row, rebuilt only when the row changes
+def get_tax_table(deduction_tax: Deduction):
+    cached = _tax_tables.get(deduction_tax.id)
+    if cached and cached[0] == deduction_tax.updated_at:
+        return cached[1]
+    table = compile_tax_brackets(deduction_tax.data)
+    _tax_tables[deduction_tax.id] = (deduction_tax.updated_at, table)
+    return table
+
+# ===============================
+# PAY PERIOD
+# ===============================
+# a pay period is the month of the payment date, stored as its first day
+def get_pay_period(payment_date: date):
+    return date(payment_date.year, payment_date.month, 1)
+
+# ===============================
+# RULE SET
+# ===============================
+# every compensation rule a payroll run needs, served from the rule cache
+# so the per employee calculation below is pure in-memory work
+def load_rule_set():
+    rules = get_rules()["rule_set"]
+    if rules["tax"] is None:
+        raise Deduction.DoesNotExist("Active Tax deduction not found")
+    if rules["pension"] is None:
+        raise Deduction.DoesNotExist("Active Pension deduction not found")
+    return rules
+
+# compute the deductions of one employee against a loaded rule set
+def compute_deductions(deduction: list, salary: float, rules: dict):
+    deduction_tax = rules["tax"]
+    deduction_pension = rules["pension"]
     all_deduction = {}
     total_deduction = {
         "total": 0
     }
 
     # tax deduction
-    employee_tax_obj = get_tax(deduction_tax.data, salary) if deduction_tax is not None else []
+    employee_tax_obj = find_tax_bracket(get_tax_table(deduction_tax), salary) if deduction_tax is not None else []
     if employee_tax_obj:
         all_deduction["TAX"] = employee_tax_obj
         tax_deduction = (float(salary) * float(employee_tax_obj["rate"])) / 100 - float(employee_tax_obj["deduction"])
@@ -53,79 +129,121 @@ def get_deductions(deduction: dict, salary: float):
     else:
         all_deduction["TAX"] = {}
 
-    # pension deduction 
+    # pension deduction
     if deduction_pension.data:
         all_deduction["PENSION"] = deduction_pension.data[0]
         pension_deduction = (float(salary) * float(deduction_pension.data[0]["percentage"])) / 100
         total_deduction["total"] += pension_deduction
     else:
         all_deduction["PENSION"] = {}
-    other_deduction_list = []
+
     # other deduction
-    if deduction:
-        for deduction in deduction: 
-            deduction_data = get_deduction_data_by_id(deduction)
-            if deduction_data:
-                if deduction_data[0]["type"] == "fixed":
-                    total_deduction["total"] += float(deduction_data[0]["amount"])
-                elif deduction_data[0]["type"] == "percentage":
-                    total_deduction["total"] += (float(salary) * float(deduction_data[0]["percentage"])) / 100
-                other_deduction_list.append({
-                    "id": str(deduction_data[0]["id"]),
-                    "name": str(deduction_data[0]["name"]),
-                    "type": str(deduction_data[0]["type"]),
-                    "percentage": float(deduction_data[0]["percentage"]),
-                    "amount": float(deduction_data[0]["amount"]),
-                    "description": str(deduction_data[0]["description"]),
-                    "is_active": bool(deduction_data[0]["is_active"])
-                })
-    else:
-        other_deduction_list = []
+    other_deduction_list = []
+    for deduction_id in deduction or []:
+        deduction_data = rules["other"].get(str(deduction_id))
+        if deduction_data:
+            if deduction_data["type"] == "fixed":
+                total_deduction["total"] += float(deduction_data["amount"])
+            elif deduction_data["type"] == "percentage":
+                total_deduction["total"] += (float(salary) * float(deduction_data["percentage"])) / 100
+            other_deduction_list.append({
+                "id": str(deduction_data["id"]),
+                "name": str(deduction_data["name"]),
+                "type": str(deduction_data["type"]),
+                "percentage": float(deduction_data["percentage"]),
+                "amount": float(deduction_data["amount"]),
+                "description": str(deduction_data["description"]),
+                "is_active": bool(deduction_data["is_active"])
+            })
     all_deduction["OTHER"] = other_deduction_list
     all_deduction["TOTAL"] = total_deduction["total"]
 
     return all_deduction
 
-# get allowances
-def get_allowances(allowance: list, salary: float):
-    # ===============================
-    # ALLOWANCES
-    # ===============================
+# compute the allowances of one employee against a loaded rule set
+def compute_allowances(allowance: list, salary: float, rules: dict):
     all_allowance = {}
     allowance_list = []
     total_allowance = {
         "total": 0
-    }   
-    if allowance:
-        for allowance in allowance:
-            allowance_data = get_allowance_data_by_id(allowance)
-            if allowance_data:
-                if allowance_data.type == "fixed":
-                    total_allowance["total"] += float(allowance_data.amount)
-                elif allowance_data.type == "percentage":
-                    total_allowance["total"] += (float(salary) * float(allowance_data.percentage)) / 100
-                allowance_list.append({
-                    "id": str(allowance_data.id),
-                    "name": str(allowance_data.name),
-                    "type": str(allowance_data.type),
-                    "percentage": float(allowance_data.percentage),
-                    "amount": float(allowance_data.amount),
-                    "description": str(allowance_data.description),
-                    "is_active": bool(allowance_data.is_active)
-                })
-    else:
-        all_allowance["ALLOWANCE"] = []
-        
+    }
+    for allowance_id in allowance or []:
+        allowance_data = rules["allowance"].get(str(allowance_id))
+        if allowance_data:
+            if allowance_data.type == "fixed":
+                total_allowance["total"] += float(allowance_data.amount)
+            elif allowance_data.type == "percentage":
+                total_allowance["total"] += (float(salary) * float(allowance_data.percentage)) / 100
+            allowance_list.append({
+                "id": str(allowance_data.id),
+                "name": str(allowance_data.name),
+                "type": str(allowance_data.type),
+                "percentage": float(allowance_data.percentage or 0),
+                "amount": float(allowance_data.amount or 0),
+                "description": str(allowance_data.description),
+                "is_active": bool(allowance_data.is_active)
+            })
+
     all_allowance["ALLOWANCE"] = allowance_list
-    all_allowance["TOTAL"] =  total_allowance["total"]
+    all_allowance["TOTAL"] = total_allowance["total"]
     return all_allowance
 
+# fingerprint of everything a payroll is computed from: the salary, the
+# assigned rule IDs and the updated_at of every rule row they reference
+def get_payroll_fingerprint(employee, payment_date: date, rules: dict):
+    allowances = []
+    for allowance_id in employee.allowance or []:
+        allowance_data = rules["allowance"].get(str(allowance_id))
+        allowances.append(f"{allowance_id}@{allowance_data.updated_at.isoformat() if allowance_data else 'missing'}")
+
+    parts = [
+        str(employee.basic_salary),
+        str(payment_date),
+        ",".join(allowances),
+        ",".join(str(deduction_id) for deduction_id in employee.deduction or []),
+        rules["tax"].updated_at.isoformat(),
+        rules["pension"].updated_at.isoformat(),
+        rules["other_updated_at"].isoformat() if employee.deduction and rules["other_updated_at"] else "",
+        # the payroll keeps a snapshot of the department and branch
+        str(employee.department_id),
+        str(employee.work_location_id),
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+# net pay of a computed payroll
+def get_net_salary(salary: float, all_allowance: dict, all_deduction: dict):
+    return float(salary) + all_allowance["TOTAL"] - all_deduction["TOTAL"]
+
+# amount of one allowance or other deduction item of a breakdown
+def get_rule_amount(salary: float, rule: dict):
+    if rule["type"] == "fixed":
+        return float(rule["amount"])
+    if rule["type"] == "percentage":
+        return (float(salary) * float(rule["percentage"])) / 100
+    return 0.0
+
+# tax and pension amounts of a computed deduction breakdown
+def get_tax_amount(salary: float, all_deduction: dict):
+    tax = all_deduction["TAX"]
+    return (float(salary) * float(tax["rate"])) / 100 - float(tax["deduction"]) if tax else 0.0
+
+def get_pension_amount(salary: float, all_deduction: dict):
+    pension = all_deduction["PENSION"]
+    return (float(salary) * float(pension["percentage"])) / 100 if pension else 0.0
+
+# get deductions
+def get_deductions(deduction: list, salary: float):
+    return compute_deductions(deduction, salary, load_rule_set())
+
+# get allowances
+def get_allowances(allowance: list, salary: float):
+    return compute_allowances(allowance, salary, load_rule_set())
+
 # is active allowance
 def get_allowance_data_by_id(allowance: uuid.UUID):
-    allowance_data = Allowance.objects.filter(id=allowance, is_active=True, is_deleted=False).first()
-    return allowance_data if allowance_data else None
+    return get_cached_allowance(allowance, active_only=True)
 
 def get_deduction_data_by_id(deduction: uuid.UUID):
-   OtherDeduction = Deduction.objects.filter(is_active=True, type="Other").first()
-   other_deduction_data = [d for d in OtherDeduction.data if d['id'] == deduction]    
-   return other_deduction_data if other_deduction_data else None
\ No newline at end of file
+   OtherDeduction = get_cached_deduction("Other", active_only=True)
+   other_deduction_data = [d for d in OtherDeduction.data if d['id'] == deduction]
+   return other_deduction_data if other_deduction_data else None
@@ -0,0 +1,125 @@
+# ===============================================================
+# PAYROLL BACKFILL
+# ===============================================================
+# One-off backfill of the payrolls written before the pay period column
+# existed. Existing rows get pay_period = the first day of the month of
+# their payment date; an employee paid twice in the same month keeps the
+# payroll with the latest payment date, like a re-run of the month does,
+# so the unique (employee, pay period) constraint holds for every row.
+# Their total columns are then computed from the stored allowance and
+# deduction breakdowns, with their line items, and the cost rollups and
+# year-to-date ledger are rebuilt from them.
+from datetime import date
+
+from django.db import transaction
+
+from emp_payroll.models import Payroll
+from utility.payroll import get_pay_period
+from utility.payroll_engine import get_payroll_totals, write_line_items
+from utility.payroll_ledger import rebuild_payroll_ledger
+from utility.payroll_rollup import refresh_cost_rollups
+
+# payroll columns computed from the breakdowns
+TOTAL_FIELDS = ["gross_salary", "total_allowance", "total_deduction", "tax", "pension", "net_salary"]
+
+# ids deleted per statement when resolving duplicate payrolls
+BACKFILL_CHUNK_SIZE = 2000
+
+def next_month(month: date):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def get_duplicate_payrolls():
+    """
+    Find the payrolls superseded by a later payroll of the same employee
+    and month.
+
+    Returns:
+        list: The ids of the payrolls to remove, the latest payroll (payment
+        date, then creation time) of every employee and month is kept.
+    """
+    kept, duplicates = {}, []
+    rows = Payroll.objects.order_by("employee_id", "payment_date", "created_at", "id").values_list("id", "employee_id", "payment_date")
+    for payroll_id, employee_id, payment_date in rows.iterator(chunk_size=BACKFILL_CHUNK_SIZE):
+        key = (employee_id, get_pay_period(payment_date))
+        if key in kept:
+            duplicates.append(kept[key])
+        kept[key] = payroll_id
+    return duplicates
+
+def backfill_pay_periods(dry_run: bool = False):
+    """
+    Set the pay period of the payrolls without one and remove the payrolls
+    superseded in the same month.
+
+    Args:
+        dry_run: Only count the rows, change nothing.
+
+    Returns:
+        tuple: (number of payrolls given a pay period, number of duplicate
+        payrolls removed).
+    """
+    duplicates = get_duplicate_payrolls()
+    missing = Payroll.objects.filter(pay_period__isnull=True)
+    if dry_run:
+        return missing.exclude(id__in=duplicates).count(), len(duplicates)
+
+    updated = 0
+    with transaction.atomic():
+        for start in range(0, len(duplicates), BACKFILL_CHUNK_SIZE):
+            Payroll.objects.filter(id__in=duplicates[start:start + BACKFILL_CHUNK_SIZE]).delete()
+        # one set-based UPDATE per month
+        for month in missing.dates("payment_date", "month"):
+            updated += missing.filter(payment_date__gte=month, payment_date__lt=next_month(month)).update(pay_period=month)
+    return updated, len(duplicates)
+
+def backfill_payroll_totals(dry_run: bool = False, chunk_size: int = BACKFILL_CHUNK_SIZE):
+    """
+    Compute the total columns of the payrolls written before they existed.
+
+    Those payrolls still hold the column defaults (every total at 0); their
+    totals and line items are computed from the stored breakdowns, then the
+    cost rollups of their periods and the ledger are rebuilt. A payroll
+    whose breakdowns cannot be read is left alone and counted as skipped.
+
+    Args:
+        dry_run: Only count the rows, change nothing.
+        chunk_size: The number of payrolls updated at a time.
+
+    Returns:
+        tuple: (number of payrolls backfilled, number skipped).
+    """
+    payrolls = Payroll.objects.filter(pay_period__isnull=False, **{field: 0 for field in TOTAL_FIELDS})
+    if dry_run:
+        return payrolls.count(), 0
+
+    updated, skipped, periods = 0, 0, set()
+    with transaction.atomic():
+        last_id = None
+        while True:
+            chunk_query = payrolls.filter(id__gt=last_id) if last_id else payrolls
+            chunk = list(chunk_query.order_by("id")[:chunk_size])
+            if not chunk:
+                break
+            last_id = chunk[-1].id
+
+            backfilled = []
+            for payroll in chunk:
+                try:
+                    totals = get_payroll_totals(payroll.basic_salary, payroll.allowance, payroll.deduction)
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                for field, value in totals.items():
+                    setattr(payroll, field, value)
+                backfilled.append(payroll)
+                periods.add(payroll.pay_period)
+
+            Payroll.objects.bulk_update(backfilled, TOTAL_FIELDS)
+            write_line_items(backfilled)
+            updated += len(backfilled)
+
+        for pay_period in sorted(periods):
+            refresh_cost_rollups(pay_period)
+        if periods:
+            rebuild_payroll_ledger()
+    return updated, skipped
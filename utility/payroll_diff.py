@@ -0,0 +1,148 @@
+# ===============================================================
+# PAYROLL DIFF
+# ===============================================================
+# Employee by employee comparison of the payrolls of two pay periods.
+# Both periods are joined to the employees in a single query (two
+# filtered LEFT JOINs), the line items of each chunk of employees are
+# compared with one more query, and only the employees whose payroll
+# changed are streamed as newline delimited JSON.
+import json
+from decimal import Decimal
+from itertools import islice
+
+from django.db.models import FilteredRelation, Q
+from django.http import StreamingHttpResponse
+
+from employees.models import Employee
+from emp_payroll.models import PayrollLineItem
+
+# employees compared per line item query
+DIFF_CHUNK_SIZE = 2000
+
+# payroll columns compared between the two periods
+DIFF_FIELDS = ["gross_salary", "net_salary"]
+
+# kinds with a single line item per payroll, matched on the kind alone so
+# a change of tax bracket or pension rule is one changed line, not a
+# removed and an added one
+SINGLE_ITEM_KINDS = {"tax", "pension"}
+
+# ===============================
+# ROWS
+# ===============================
+def get_diff_rows(from_period, to_period):
+    fields = ["id", "full_name", "from_payroll__id", "to_payroll__id"]
+    for field in DIFF_FIELDS:
+        fields += [f"from_payroll__{field}", f"to_payroll__{field}"]
+    return (
+        Employee.objects
+        .annotate(
+            from_payroll=FilteredRelation("payrolls", condition=Q(payrolls__pay_period=from_period)),
+            to_payroll=FilteredRelation("payrolls", condition=Q(payrolls__pay_period=to_period)),
+        )
+        .filter(Q(from_payroll__id__isnull=False) | Q(to_payroll__id__isnull=False))
+        .order_by("id")
+        .values(*fields)
+    )
+
+def get_line_items(payroll_ids: list):
+    items = {}
+    for payroll_id, kind, rule_id, name, amount in PayrollLineItem.objects.filter(payroll_id__in=payroll_ids).values_list("payroll_id", "kind", "rule_id", "name", "amount"):
+        key = (kind, "") if kind in SINGLE_ITEM_KINDS else (kind, rule_id)
+        items.setdefault(payroll_id, {})[key] = (rule_id, name, amount)
+    return items
+
+def diff_line_items(old: dict, new: dict):
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        old_rule_id, old_name, old_amount = old.get(key, (None, None, Decimal("0")))
+        new_rule_id, new_name, new_amount = new.get(key, (None, None, Decimal("0")))
+        if key in old and key in new and old_amount == new_amount and old_rule_id == new_rule_id:
+            continue
+        change = {
+            "kind": key[0],
+            "rule_id": new_rule_id or old_rule_id,
+            "name": new_name or old_name,
+            "from": float(old_amount) if key in old else None,
+            "to": float(new_amount) if key in new else None,
+            "delta": float(new_amount - old_amount),
+        }
+        # the bracket or rule of both periods, which may differ
+        if key[0] in SINGLE_ITEM_KINDS:
+            change.update({"from_rule_id": old_rule_id, "to_rule_id": new_rule_id})
+        changes.append(change)
+    return changes
+
+def compare_row(row: dict, line_items: dict):
+    old_id, new_id = row["from_payroll__id"], row["to_payroll__id"]
+    if old_id is None:
+        status = "added"
+    elif new_id is None:
+        status = "removed"
+    else:
+        status = "changed"
+
+    item_changes = diff_line_items(line_items.get(old_id, {}), line_items.get(new_id, {}))
+    deltas = {}
+    for field in DIFF_FIELDS:
+        old_value = row[f"from_payroll__{field}"] or Decimal("0")
+        new_value = row[f"to_payroll__{field}"] or Decimal("0")
+        deltas[field] = new_value - old_value
+
+    if status == "changed" and not item_changes and not any(deltas.values()):
+        return None
+    return {
+        "employee_id": str(row["id"]),
+        "full_name": row["full_name"],
+        "status": status,
+        "from": {field: float(row[f"from_payroll__{field}"]) for field in DIFF_FIELDS} if old_id else None,
+        "to": {field: float(row[f"to_payroll__{field}"]) for field in DIFF_FIELDS} if new_id else None,
+        "delta": {field: float(delta) for field, delta in deltas.items()},
+        "line_items": item_changes,
+    }
+
+# ===============================
+# DIFF
+# ===============================
+def iter_payroll_diff(from_period, to_period, chunk_size: int = DIFF_CHUNK_SIZE):
+    """
+    Yield the employees whose payroll differs between two pay periods,
+    followed by a summary.
+
+    Args:
+        from_period: The first day of the month compared from.
+        to_period: The first day of the month compared to.
+        chunk_size: The number of employees compared per line item query.
+
+    Yields:
+        dict: One dict per changed, added or removed employee ('type' is
+        'employee') and a last one with the counts and total deltas
+        ('type' is 'summary').
+    """
+    summary = {"type": "summary", "compared": 0, "changed": 0, "added": 0, "removed": 0}
+    summary.update({f"{field}_delta": 0.0 for field in DIFF_FIELDS})
+
+    rows = get_diff_rows(from_period, to_period).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        payroll_ids = [payroll_id for row in chunk for payroll_id in (row["from_payroll__id"], row["to_payroll__id"]) if payroll_id]
+        line_items = get_line_items(payroll_ids)
+        for row in chunk:
+            summary["compared"] += 1
+            result = compare_row(row, line_items)
+            if result is None:
+                continue
+            summary[result["status"]] += 1
+            for field in DIFF_FIELDS:
+                summary[f"{field}_delta"] += result["delta"][field]
+            yield {"type": "employee", **result}
+
+    for field in DIFF_FIELDS:
+        summary[f"{field}_delta"] = round(summary[f"{field}_delta"], 2)
+    yield summary
+
+def stream_payroll_diff(from_period, to_period):
+    lines = (json.dumps(result) + "\n" for result in iter_payroll_diff(from_period, to_period))
+    return StreamingHttpResponse(lines, content_type="application/x-ndjson")
@@ -0,0 +1,388 @@
+# ===============================================================
+# PAYROLL RUN ENGINE
+# ===============================================================
+# A payroll run loads the compensation rules once, computes every active
+# employee in memory and writes the payrolls with chunked bulk inserts.
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+import time
+
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from emp_payroll.models import Payroll, PayrollRun, PayrollLineItem
+from employees.models import Employee
+from utility.payroll import load_rule_set, compute_allowances, compute_deductions, get_net_salary, get_pay_period, get_payroll_fingerprint
+from utility.payroll import get_tax_amount, get_pension_amount, get_rule_amount
+from utility.payroll_rollup import refresh_cost_rollups
+from utility.payroll_ledger import LEDGER_FIELDS, get_ledger_deltas, apply_ledger_deltas
+from utility.payroll_lock import payroll_period_lock
+
+# number of payrolls written per bulk insert
+PAYROLL_CHUNK_SIZE = 1000
+
+# ===============================
+# QUERY COUNTER
+# ===============================
+@contextmanager
+def count_queries():
+    """
+    Count the SQL queries executed on the current connection.
+
+    Works regardless of DEBUG, the counter is a dict so the caller can read
+    the final value after the block exits.
+    """
+    counter = {"queries": 0}
+
+    def wrapper(execute, sql, params, many, context):
+        counter["queries"] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        yield counter
+
+# ===============================
+# PAYROLL CALCULATION
+# ===============================
+def get_payroll_employees():
+    return (
+        Employee.objects
+        .filter(is_deleted=False, is_active=True)
+        .select_related("department", "department__manager", "work_location")
+    )
+
+def to_payment_date(payment_date):
+    if isinstance(payment_date, datetime):
+        return payment_date.date()
+    return payment_date
+
+def to_amount(value):
+    return Decimal(str(round(float(value), 2)))
+
+def build_payroll(employee: Employee, payment_date: date, rules: dict, fingerprint: str = None):
+    """
+    Build (without saving) the payroll of one employee.
+
+    Besides the allowance and deduction breakdowns, the payroll stores the
+    department and branch of the employee and its totals as plain columns
+    so they can be aggregated without decoding the JSON.
+
+    Args:
+        employee: The employee to pay.
+        payment_date: The payment date of the run.
+        rules: The rule set returned by load_rule_set.
+        fingerprint: The input fingerprint when already computed.
+
+    Returns:
+        An unsaved Payroll instance.
+    """
+    allowance = compute_allowances(employee.allowance, employee.basic_salary, rules)
+    deduction = compute_deductions(employee.deduction, employee.basic_salary, rules)
+    return Payroll(
+        employee_id=employee,
+        department_id=employee.department_id,
+        work_location_id=employee.work_location_id,
+        basic_salary=employee.basic_salary,
+        allowance=allowance,
+        deduction=deduction,
+        payment_date=payment_date,
+        pay_period=get_pay_period(payment_date),
+        input_fingerprint=fingerprint or get_payroll_fingerprint(employee, payment_date, rules),
+        **get_payroll_totals(employee.basic_salary, allowance, deduction),
+    )
+
+def get_payroll_totals(basic_salary, allowance: dict, deduction: dict):
+    # the total columns of a payroll, from its allowance and deduction breakdowns
+    return {
+        "gross_salary": to_amount(float(basic_salary) + allowance["TOTAL"]),
+        "total_allowance": to_amount(allowance["TOTAL"]),
+        "total_deduction": to_amount(deduction["TOTAL"]),
+        "tax": to_amount(get_tax_amount(basic_salary, deduction)),
+        "pension": to_amount(get_pension_amount(basic_salary, deduction)),
+        "net_salary": to_amount(get_net_salary(basic_salary, allowance, deduction)),
+    }
+
+def empty_totals():
+    return {"basic_salary": 0.0, "allowance": 0.0, "deduction": 0.0, "net": 0.0}
+
+def add_to_totals(totals: dict, basic_salary, allowance: dict, deduction: dict):
+    totals["basic_salary"] += float(basic_salary)
+    totals["allowance"] += allowance["TOTAL"]
+    totals["deduction"] += deduction["TOTAL"]
+    totals["net"] += get_net_salary(basic_salary, allowance, deduction)
+
+def get_stored_payrolls(pay_period: date, employee_ids: list):
+    return {
+        employee_id: (fingerprint, basic_salary, allowance, deduction)
+        for employee_id, fingerprint, basic_salary, allowance, deduction in Payroll.objects.filter(
+            pay_period=pay_period,
+            employee_id__in=employee_ids,
+        ).values_list("employee_id", "input_fingerprint", "basic_salary", "allowance", "deduction")
+    }
+
+def build_chunk(employees: list[Employee], payment_date: date, rules: dict, totals: dict, incremental: bool = False):
+    """
+    Build the payrolls of a chunk of employees.
+
+    In incremental mode the stored payrolls of the chunk are read in one
+    query and employees whose input fingerprint matches the stored one are
+    skipped without being recomputed. An employee whose payroll cannot be
+    computed is reported as an error instead of failing the whole chunk.
+
+    Args:
+        employees: The employees of the chunk.
+        payment_date: The payment date of the run.
+        rules: The rule set returned by load_rule_set.
+        totals: The running totals, updated in place. Pass a copy when the
+            totals must not change until the chunk is written.
+        incremental: Skip the employees whose inputs did not change.
+
+    Returns:
+        A tuple of the built payrolls, the errors and the number of
+        skipped employees.
+    """
+    stored = get_stored_payrolls(get_pay_period(payment_date), [employee.id for employee in employees]) if incremental else {}
+
+    payrolls, errors, skipped = [], [], 0
+    for employee in employees:
+        try:
+            fingerprint = get_payroll_fingerprint(employee, payment_date, rules)
+            existing = stored.get(employee.id)
+            if existing and existing[0] == fingerprint:
+                add_to_totals(totals, *existing[1:])
+                skipped += 1
+                continue
+            payroll = build_payroll(employee, payment_date, rules, fingerprint)
+            add_to_totals(totals, payroll.basic_salary, payroll.allowance, payroll.deduction)
+            payrolls.append(payroll)
+        except Exception as e:
+            errors.append({"employee_id": str(employee.id), "message": str(e)})
+    return payrolls, errors, skipped
+
+# ===============================
+# PAYROLL LINE ITEMS
+# ===============================
+def build_line_items(payroll: Payroll):
+    """
+    Split the allowance and deduction breakdowns of a payroll into line items.
+    """
+    salary = payroll.basic_salary
+
+    def line_item(kind, rule, name, amount):
+        return PayrollLineItem(
+            payroll_id=payroll.id,
+            pay_period=payroll.pay_period,
+            kind=kind,
+            rule_id=str(rule.get("id", "")),
+            name=rule.get("name", name),
+            amount=to_amount(amount),
+        )
+
+    items = [line_item("allowance", a, "", get_rule_amount(salary, a)) for a in payroll.allowance["ALLOWANCE"]]
+    if payroll.deduction["TAX"]:
+        items.append(line_item("tax", payroll.deduction["TAX"], "Tax", get_tax_amount(salary, payroll.deduction)))
+    if payroll.deduction["PENSION"]:
+        items.append(line_item("pension", payroll.deduction["PENSION"], "Pension", get_pension_amount(salary, payroll.deduction)))
+    items.extend(line_item("deduction", d, "", get_rule_amount(salary, d)) for d in payroll.deduction["OTHER"])
+    return items
+
+def write_line_items(payrolls: list[Payroll]):
+    PayrollLineItem.objects.filter(payroll_id__in=[payroll.id for payroll in payrolls]).delete()
+    PayrollLineItem.objects.bulk_create(
+        [item for payroll in payrolls for item in build_line_items(payroll)],
+        batch_size=PAYROLL_CHUNK_SIZE,
+    )
+
+# ===============================
+# PAYROLL UPSERT
+# ===============================
+# fields rewritten when a payroll of the same employee and pay period exists
+PAYROLL_UPSERT_FIELDS = [
+    "department", "work_location", "basic_salary", "allowance", "deduction", "payment_date", "input_fingerprint",
+    "gross_salary", "total_allowance", "total_deduction", "tax", "pension", "net_salary", "updated_at",
+]
+
+def write_payrolls(payrolls: list[Payroll]):
+    """
+    Upsert payrolls on (employee, pay period).
+
+    The stored payrolls of the chunk are read in one query; payrolls equal
+    to the stored ones are left alone and the rest is written with a single
+    INSERT ... ON CONFLICT DO UPDATE, so a retried or re-run month only
+    rewrites the rows that changed. The line items of the written payrolls
+    are replaced in bulk and the difference with the stored payrolls is
+    added to the year-to-date ledger.
+
+    Args:
+        payrolls: Payrolls of a single pay period.
+
+    Returns:
+        A tuple of the written payrolls and the number of unchanged ones.
+    """
+    if not payrolls:
+        return [], 0
+
+    compared_fields = [
+        "basic_salary", "allowance", "deduction", "payment_date", "input_fingerprint", "department_id", "work_location_id",
+    ]
+    stored, previous_totals = {}, {}
+    for employee_id, payroll_id, *values in Payroll.objects.filter(
+        pay_period=payrolls[0].pay_period,
+        employee_id__in=[payroll.employee_id_id for payroll in payrolls],
+    ).values_list("employee_id", "id", *compared_fields, *LEDGER_FIELDS):
+        stored[employee_id] = (payroll_id, *values[:len(compared_fields)])
+        previous_totals[employee_id] = values[len(compared_fields):]
+
+    changed = []
+    for payroll in payrolls:
+        existing = stored.get(payroll.employee_id_id)
+        if existing:
+            # keep the stored primary key so the instance matches the upserted row
+            payroll.id = existing[0]
+            if existing[1:] == (
+                payroll.basic_salary, payroll.allowance, payroll.deduction, payroll.payment_date, payroll.input_fingerprint,
+                payroll.department_id, payroll.work_location_id,
+            ):
+                continue
+        changed.append(payroll)
+
+    Payroll.objects.bulk_create(
+        changed,
+        update_conflicts=True,
+        unique_fields=["employee_id", "pay_period"],
+        update_fields=PAYROLL_UPSERT_FIELDS,
+    )
+    if changed:
+        write_line_items(changed)
+        apply_ledger_deltas(get_ledger_deltas(changed, previous_totals))
+    return changed, len(payrolls) - len(changed)
+
+# ===============================
+# SYNCHRONOUS PAYROLL RUN
+# ===============================
+def run_payroll(payment_date: date, chunk_size: int = PAYROLL_CHUNK_SIZE, incremental: bool = False):
+    """
+    Create the payroll of every active employee in a single transaction,
+    holding the lock of the pay period.
+
+    Args:
+        payment_date: The payment date of the run.
+        chunk_size: The number of payrolls written per bulk insert.
+        incremental: Skip the employees whose inputs did not change.
+
+    Returns:
+        A tuple of the written payrolls and the run stats (employees,
+        skipped, recomputed, written, unchanged, query_count, elapsed_ms).
+    """
+    payment_date = to_payment_date(payment_date)
+
+    started = time.perf_counter()
+    stats = {"employees": 0, "skipped": 0, "recomputed": 0, "written": 0, "unchanged": 0}
+    written_payrolls = []
+    with payroll_period_lock(get_pay_period(payment_date), "run_payroll"):
+        with count_queries() as counter:
+            with transaction.atomic():
+                rules = load_rule_set()
+                employees = list(get_payroll_employees())
+                for start in range(0, len(employees), chunk_size):
+                    chunk = employees[start:start + chunk_size]
+                    payrolls, errors, skipped = build_chunk(chunk, payment_date, rules, empty_totals(), incremental)
+                    if errors:
+                        raise ValueError(errors[0]["message"])
+                    changed, unchanged = write_payrolls(payrolls)
+                    written_payrolls.extend(changed)
+                    stats["employees"] += len(chunk)
+                    stats["skipped"] += skipped
+                    stats["recomputed"] += len(payrolls)
+                    stats["written"] += len(changed)
+                    stats["unchanged"] += unchanged
+                refresh_cost_rollups(get_pay_period(payment_date))
+
+    stats["query_count"] = counter["queries"]
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return written_payrolls, stats
+
+# ===============================
+# BACKGROUND PAYROLL RUN
+# ===============================
+def execute_payroll_run(run_id, chunk_size: int = PAYROLL_CHUNK_SIZE):
+    """
+    Execute a queued payroll run chunk by chunk.
+
+    Employees are processed in primary key order and every chunk is written
+    in its own transaction together with the progress of the run and a
+    checkpoint (the last employee of the chunk and the running totals). A
+    run that failed or whose worker died is resumed from its checkpoint:
+    the chunks already committed are neither recomputed nor rewritten.
+    The run fails right away if another worker holds the pay period lock.
+
+    Args:
+        run_id: The id of the PayrollRun to execute.
+        chunk_size: The number of employees computed and written per chunk.
+    """
+    run = PayrollRun.objects.get(id=run_id)
+    run.status = "running"
+    run.started_at = run.started_at or timezone.now()
+    run.finished_at = None
+    run.save(update_fields=["status", "started_at", "finished_at", "updated_at"])
+
+    # a fresh run has no checkpoint and starts from the first employee
+    last_id = run.checkpoint_employee_id
+    totals = run.totals if last_id else empty_totals()
+    try:
+        # only one worker of the cluster executes a pay period at a time
+        with payroll_period_lock(run.pay_period, str(run.id)):
+            with count_queries() as counter:
+                rules = load_rule_set()
+                employees = get_payroll_employees().order_by("id")
+                if not last_id:
+                    PayrollRun.objects.filter(id=run.id).update(total_employees=employees.count())
+
+                while True:
+                    chunk_query = employees.filter(id__gt=last_id) if last_id else employees
+                    chunk = list(chunk_query[:chunk_size])
+                    if not chunk:
+                        break
+                    chunk_last_id = chunk[-1].id
+
+                    # the chunk works on copies: the run only takes the new
+                    # totals, errors and checkpoint once the chunk is committed
+                    chunk_totals = dict(totals)
+                    payrolls, errors, skipped = build_chunk(chunk, run.payment_date, rules, chunk_totals, run.incremental)
+                    chunk_errors = run.errors + errors
+
+                    with transaction.atomic():
+                        changed, unchanged = write_payrolls(payrolls)
+                        PayrollRun.objects.filter(id=run.id).update(
+                            processed_employees=F("processed_employees") + len(chunk),
+                            skipped_employees=F("skipped_employees") + skipped,
+                            recomputed_employees=F("recomputed_employees") + len(payrolls),
+                            written_payrolls=F("written_payrolls") + len(changed),
+                            unchanged_payrolls=F("unchanged_payrolls") + unchanged,
+                            errors=chunk_errors,
+                            totals=chunk_totals,
+                            checkpoint_employee_id=chunk_last_id,
+                            checkpoint_at=timezone.now(),
+                            updated_at=timezone.now(),
+                        )
+                    last_id, totals = chunk_last_id, chunk_totals
+                    run.errors = chunk_errors
+
+                refresh_cost_rollups(get_pay_period(run.payment_date))
+
+        PayrollRun.objects.filter(id=run.id).update(
+            status="completed",
+            query_count=F("query_count") + counter["queries"],
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    except Exception as e:
+        run.errors.append({"employee_id": None, "message": str(e)})
+        PayrollRun.objects.filter(id=run.id).update(
+            status="failed",
+            errors=run.errors,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
@@ -0,0 +1,130 @@
+# ===============================================================
+# PAYROLL REGISTER EXPORT
+# ===============================================================
+# Flattened payroll register of a pay period: one row per employee with
+# the basic salary, one column per allowance, tax, pension, one column per
+# other deduction and the net salary. Rows are read with .iterator() (a
+# server-side cursor on PostgreSQL) and written as they are read, so the
+# export runs in constant memory whatever the number of payrolls.
+import csv
+import tempfile
+from datetime import date
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+
+from emp_payroll.models import Payroll
+from utility.payroll import get_rule_amount
+from utility.rule_cache import get_rules
+from utility.streaming import Echo
+
+# rows fetched per round trip while exporting
+EXPORT_CHUNK_SIZE = 2000
+
+# supported values of the 'format' query parameter
+EXPORT_FORMATS = ["csv", "xlsx"]
+
+# ===============================
+# COLUMNS
+# ===============================
+def get_register_columns():
+    """
+    Allowance and other deduction columns of the register, one per rule
+    known to the rule cache (inactive ones included, older payrolls may
+    still reference them).
+
+    Returns:
+        tuple: (allowance columns, deduction columns), lists of (id, name).
+    """
+    rules = get_rules()
+    allowances = sorted(((rule_id, a.name) for rule_id, a in rules["allowances"].items()), key=lambda column: column[1])
+
+    deductions = {}
+    for other in rules["deductions"].get("Other", []):
+        for item in other.data or []:
+            deductions.setdefault(str(item["id"]), item["name"])
+    deductions = sorted(deductions.items(), key=lambda column: column[1])
+    return allowances, deductions
+
+def split_amounts(salary, items: list, columns: list):
+    """
+    Spread the items of a breakdown over the register columns, items whose
+    rule has no column are summed into the trailing 'other' cell.
+    """
+    index = {rule_id: position for position, (rule_id, _) in enumerate(columns)}
+    amounts = [0.0] * (len(columns) + 1)
+    for item in items or []:
+        amounts[index.get(str(item["id"]), len(columns))] += get_rule_amount(salary, item)
+    return [round(amount, 2) for amount in amounts]
+
+# ===============================
+# ROWS
+# ===============================
+def iter_register_rows(pay_period: date, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yield the header and then one row per payroll of a pay period.
+    """
+    allowance_columns, deduction_columns = get_register_columns()
+    yield [
+        "Employee ID", "Full Name", "Department", "Branch", "Payment Date", "Basic Salary",
+        *[name for _, name in allowance_columns], "Other Allowances", "Total Allowance", "Gross Salary",
+        "Tax", "Pension",
+        *[name for _, name in deduction_columns], "Other Deductions", "Total Deduction", "Net Salary",
+    ]
+
+    payrolls = (
+        Payroll.objects
+        .filter(pay_period=pay_period)
+        .order_by("employee_id__full_name", "employee_id")
+        .values_list(
+            "employee_id", "employee_id__full_name", "department__dep_name", "work_location__branch_name",
+            "payment_date", "basic_salary", "allowance", "deduction",
+            "total_allowance", "gross_salary", "tax", "pension", "total_deduction", "net_salary",
+        )
+    )
+    for (employee_id, full_name, department, branch, payment_date, basic_salary, allowance, deduction,
+         total_allowance, gross_salary, tax, pension, total_deduction, net_salary) in payrolls.iterator(chunk_size=chunk_size):
+        yield [
+            str(employee_id), full_name, department or "", branch or "", payment_date.isoformat(), basic_salary,
+            *split_amounts(basic_salary, allowance.get("ALLOWANCE"), allowance_columns), total_allowance, gross_salary,
+            tax, pension,
+            *split_amounts(basic_salary, deduction.get("OTHER"), deduction_columns), total_deduction, net_salary,
+        ]
+
+# ===============================
+# RESPONSES
+# ===============================
+def export_register_csv(pay_period: date):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse(
+        (writer.writerow(row) for row in iter_register_rows(pay_period)),
+        content_type="text/csv",
+    )
+    response["Content-Disposition"] = f'attachment; filename="payroll_register_{pay_period:%Y-%m}.csv"'
+    return response
+
+def export_register_xlsx(pay_period: date):
+    """
+    Write the register with openpyxl's write-only workbook, which flushes
+    the rows to disk as they are appended, and serve the file.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=f"{pay_period:%Y-%m}")
+    for row in iter_register_rows(pay_period):
+        sheet.append(row)
+
+    # the temporary file is removed once the response closes it
+    output = tempfile.TemporaryFile(suffix=".xlsx")
+    workbook.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f"payroll_register_{pay_period:%Y-%m}.xlsx",
+        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    )
+
+def export_payroll_register(pay_period: date, export_format: str = "csv"):
+    if export_format == "xlsx":
+        return export_register_xlsx(pay_period)
+    return export_register_csv(pay_period)
@@ -0,0 +1,111 @@
+# ===============================================================
+# PAYROLL RUN JOBS
+# ===============================================================
+# Payroll runs are queued in the payroll_runs table and executed by an
+# in-process thread pool, so no external broker is needed. Runs left
+# pending (e.g. after a restart) are picked up by the
+# process_payroll_runs management command.
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from emp_payroll.models import PayrollRun
+from utility.payroll import get_pay_period
+from utility.payroll_engine import execute_payroll_run
+from utility.payroll_shards import execute_sharded_run
+
+PAYROLL_JOB_WORKERS = getattr(settings, "PAYROLL_JOB_WORKERS", 2)
+
+# a running run without progress for this many seconds is considered dead
+PAYROLL_RUN_STALE_SECONDS = getattr(settings, "PAYROLL_RUN_STALE_SECONDS", 300)
+
+_executor = ThreadPoolExecutor(max_workers=PAYROLL_JOB_WORKERS, thread_name_prefix="payroll-run")
+
+def execute_run(run_id):
+    # sharded runs are spread over worker processes, the others run here
+    if PayrollRun.objects.filter(id=run_id).exclude(shard_by="").exists():
+        execute_sharded_run(run_id)
+    else:
+        execute_payroll_run(run_id)
+
+def _run_job(run_id):
+    close_old_connections()
+    try:
+        execute_run(run_id)
+    finally:
+        # the worker thread owns its connection, release it with the job
+        connection.close()
+
+def submit_payroll_run(run: PayrollRun):
+    """
+    Hand a queued payroll run to the worker pool.
+
+    The job is submitted once the current transaction commits so the worker
+    always sees the PayrollRun row.
+    """
+    transaction.on_commit(lambda: _executor.submit(_run_job, run.id))
+
+class PayrollRunInProgressError(Exception):
+    def __init__(self, run: PayrollRun):
+        super().__init__(f"A payroll run of {run.pay_period:%Y-%m} is in progress")
+        self.run = run
+
+def get_active_payroll_run(pay_period):
+    return PayrollRun.objects.filter(pay_period=pay_period, status__in=["pending", "running"]).first()
+
+def queue_payroll_run(payment_date, incremental: bool = False, shard_by: str = ""):
+    """
+    Queue a payroll run unless one of the same pay period is pending or running.
+
+    The unique constraint on the active runs of a period makes the check
+    hold across every API node.
+
+    Raises:
+        PayrollRunInProgressError: With the active run of the period.
+    """
+    pay_period = get_pay_period(payment_date)
+    try:
+        with transaction.atomic():
+            run = PayrollRun.objects.create(payment_date=payment_date, pay_period=pay_period, incremental=incremental, shard_by=shard_by or "")
+    except IntegrityError:
+        active = get_active_payroll_run(pay_period)
+        if active is None:
+            raise
+        raise PayrollRunInProgressError(active)
+    submit_payroll_run(run)
+    return run
+
+class PayrollRunNotResumableError(ValueError):
+    pass
+
+def is_resumable(run: PayrollRun):
+    if run.status == "failed":
+        return True
+    # the worker of a running run that stopped making progress died
+    return run.status == "running" and run.updated_at < timezone.now() - timedelta(seconds=PAYROLL_RUN_STALE_SECONDS)
+
+def resume_payroll_run(run: PayrollRun):
+    """
+    Queue a failed or stalled payroll run again, it continues from its checkpoint.
+
+    Raises:
+        PayrollRunNotResumableError: If the run is pending, completed or
+        still making progress.
+        PayrollRunInProgressError: If another run of the period is active.
+    """
+    if not is_resumable(run):
+        raise PayrollRunNotResumableError(f"Payroll run is {run.status} and cannot be resumed")
+    # only one of two concurrent resumes gets the run
+    try:
+        with transaction.atomic():
+            resumed = PayrollRun.objects.filter(id=run.id, status=run.status, updated_at=run.updated_at).update(status="pending", updated_at=timezone.now())
+    except IntegrityError:
+        raise PayrollRunInProgressError(get_active_payroll_run(run.pay_period) or run)
+    if not resumed:
+        raise PayrollRunNotResumableError("Payroll run was resumed by another request")
+    run.refresh_from_db()
+    submit_payroll_run(run)
+    return run
@@ -0,0 +1,135 @@
+# ===============================================================
+# YEAR-TO-DATE PAYROLL LEDGER
+# ===============================================================
+# Running totals of every employee per calendar year. The payroll write
+# path applies the difference between the new and the stored payrolls in
+# the same transaction, so the ledger always matches the payrolls table;
+# rebuild_payroll_ledger recomputes it from the payrolls in one pass.
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from emp_payroll.models import Payroll, PayrollLedger
+
+# payroll columns accumulated in the ledger
+LEDGER_FIELDS = ["gross_salary", "total_allowance", "total_deduction", "tax", "pension", "net_salary"]
+
+# ledger rows written per bulk insert while rebuilding
+LEDGER_REBUILD_BATCH_SIZE = 1000
+
+# ===============================
+# INCREMENTAL UPDATE
+# ===============================
+def empty_delta():
+    return {"payroll_count": 0, **{field: Decimal("0") for field in LEDGER_FIELDS}}
+
+def get_ledger_deltas(payrolls: list[Payroll], previous: dict):
+    """
+    Differences the written payrolls make to the ledger.
+
+    Args:
+        payrolls: The written payrolls.
+        previous: Employee id -> the LEDGER_FIELDS values of the payroll the
+            write replaced, missing for new payrolls.
+
+    Returns:
+        dict: (employee id, year) -> delta of payroll_count and LEDGER_FIELDS.
+    """
+    deltas = defaultdict(empty_delta)
+    for payroll in payrolls:
+        delta = deltas[(payroll.employee_id_id, payroll.pay_period.year)]
+        old = previous.get(payroll.employee_id_id)
+        if old is None:
+            delta["payroll_count"] += 1
+        for position, field in enumerate(LEDGER_FIELDS):
+            delta[field] += getattr(payroll, field) - (old[position] if old is not None else 0)
+    return deltas
+
+def apply_ledger_deltas(deltas: dict):
+    """
+    Add deltas to the ledger rows, creating the missing ones.
+
+    The rows are locked while they are read so concurrent runs of the same
+    year cannot lose an update.
+    """
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        PayrollLedger.objects.bulk_create(
+            [PayrollLedger(employee_id=employee_id, year=year) for employee_id, year in deltas],
+            ignore_conflicts=True,
+        )
+        employee_ids = {employee_id for employee_id, _ in deltas}
+        years = {year for _, year in deltas}
+        ledgers = [
+            ledger
+            for ledger in PayrollLedger.objects.select_for_update().filter(employee_id__in=employee_ids, year__in=years)
+            if (ledger.employee_id, ledger.year) in deltas
+        ]
+        for ledger in ledgers:
+            delta = deltas[(ledger.employee_id, ledger.year)]
+            ledger.payroll_count += delta["payroll_count"]
+            for field in LEDGER_FIELDS:
+                setattr(ledger, field, getattr(ledger, field) + delta[field])
+            ledger.updated_at = timezone.now()
+        # the locked rows are written back with one INSERT ... ON CONFLICT DO
+        # UPDATE, bulk_update's CASE per row is far slower on large chunks
+        PayrollLedger.objects.bulk_create(
+            ledgers,
+            update_conflicts=True,
+            unique_fields=["employee", "year"],
+            update_fields=["payroll_count", *LEDGER_FIELDS, "updated_at"],
+        )
+
+# ===============================
+# REBUILD
+# ===============================
+def rebuild_payroll_ledger(year: int = None, chunk_size: int = 5000):
+    """
+    Recompute the ledger from the payrolls in one streaming pass.
+
+    Payrolls are read ordered by employee and period, so the totals of an
+    employee are complete as soon as the next employee starts and only one
+    batch of ledger rows is held in memory.
+
+    Args:
+        year: Only rebuild this year, every year by default.
+        chunk_size: The number of payrolls fetched per round trip.
+
+    Returns:
+        int: The number of ledger rows written.
+    """
+    payrolls = Payroll.objects.filter(pay_period__isnull=False).order_by("employee_id", "pay_period")
+    ledgers = PayrollLedger.objects.all()
+    if year:
+        payrolls = payrolls.filter(pay_period__year=year)
+        ledgers = ledgers.filter(year=year)
+
+    written = 0
+    with transaction.atomic():
+        ledgers.delete()
+
+        batch, current, totals = [], None, None
+        for employee_id, pay_period, *values in payrolls.values_list("employee_id", "pay_period", *LEDGER_FIELDS).iterator(chunk_size=chunk_size):
+            key = (employee_id, pay_period.year)
+            if key != current:
+                if current is not None:
+                    batch.append(PayrollLedger(employee_id=current[0], year=current[1], **totals))
+                current, totals = key, empty_delta()
+            totals["payroll_count"] += 1
+            for field, value in zip(LEDGER_FIELDS, values):
+                totals[field] += value
+
+            if len(batch) >= LEDGER_REBUILD_BATCH_SIZE:
+                PayrollLedger.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+
+        if current is not None:
+            batch.append(PayrollLedger(employee_id=current[0], year=current[1], **totals))
+        PayrollLedger.objects.bulk_create(batch)
+        written += len(batch)
+    return written
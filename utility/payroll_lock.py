@@ -0,0 +1,85 @@
+# ===============================================================
+# PAYROLL RUN LOCK
+# ===============================================================
+# Cluster-wide lock of a pay period, held by the worker executing a
+# payroll run so two nodes never write the payrolls of the same month at
+# the same time. On PostgreSQL it is a session advisory lock, released
+# with the lock or when the connection dies; elsewhere (SQLite in tests
+# and benchmarks) a row of the payroll_run_locks table, which expires
+# after PAYROLL_LOCK_TIMEOUT seconds if its owner crashed.
+import hashlib
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from emp_payroll.models import PayrollRunLock
+
+# seconds after which a lock table row of a crashed owner is taken over
+PAYROLL_LOCK_TIMEOUT = getattr(settings, "PAYROLL_LOCK_TIMEOUT", 3600)
+
+class PayrollPeriodLockedError(Exception):
+    pass
+
+def get_lock_key(pay_period: date):
+    # advisory locks take a signed 64 bit key
+    digest = hashlib.sha256(f"payroll:{pay_period.isoformat()}".encode()).digest()
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+# ===============================
+# POSTGRESQL
+# ===============================
+def acquire_advisory_lock(pay_period: date):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [get_lock_key(pay_period)])
+        return cursor.fetchone()[0]
+
+def release_advisory_lock(pay_period: date):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_unlock(%s)", [get_lock_key(pay_period)])
+
+# ===============================
+# LOCK TABLE
+# ===============================
+def acquire_table_lock(pay_period: date, owner: str):
+    expired = timezone.now() - timedelta(seconds=PAYROLL_LOCK_TIMEOUT)
+    PayrollRunLock.objects.filter(pay_period=pay_period, acquired_at__lt=expired).delete()
+    try:
+        with transaction.atomic():
+            PayrollRunLock.objects.create(pay_period=pay_period, owner=owner)
+        return True
+    except IntegrityError:
+        return False
+
+def release_table_lock(pay_period: date, owner: str):
+    PayrollRunLock.objects.filter(pay_period=pay_period, owner=owner).delete()
+
+# ===============================
+# LOCK
+# ===============================
+@contextmanager
+def payroll_period_lock(pay_period: date, owner: str = ""):
+    """
+    Hold the lock of a pay period for the duration of the block.
+
+    Args:
+        pay_period: The first day of the month to lock.
+        owner: Who holds the lock (e.g. the payroll run id), for the lock table.
+
+    Raises:
+        PayrollPeriodLockedError: If another worker holds the lock, the
+        caller does not wait for it.
+    """
+    advisory = connection.vendor == "postgresql"
+    acquired = acquire_advisory_lock(pay_period) if advisory else acquire_table_lock(pay_period, owner)
+    if not acquired:
+        raise PayrollPeriodLockedError(f"A payroll run of {pay_period:%Y-%m} is in progress")
+    try:
+        yield
+    finally:
+        if advisory:
+            release_advisory_lock(pay_period)
+        else:
+            release_table_lock(pay_period, owner)
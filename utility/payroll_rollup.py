@@ -0,0 +1,50 @@
+# ===============================================================
+# PAYROLL COST ROLLUPS
+# ===============================================================
+# Department and branch payroll costs per pay period. The rollups of a
+# period are rebuilt with one GROUP BY over the payrolls of the period
+# whenever its payrolls are written, so dashboards read a handful of
+# pre-aggregated rows instead of every payroll.
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from emp_payroll.models import Payroll, PayrollCostRollup
+
+# payroll columns summed into the rollups
+ROLLUP_SUM_FIELDS = ["basic_salary", "gross_salary", "total_allowance", "total_deduction", "tax", "pension", "net_salary"]
+
+def refresh_cost_rollups(pay_period: date):
+    """
+    Rebuild the cost rollups of a pay period from its payrolls.
+
+    Args:
+        pay_period: The first day of the month of the payrolls.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    groups = (
+        Payroll.objects
+        .filter(pay_period=pay_period)
+        .values("department_id", "work_location_id")
+        .annotate(employee_count=Count("id"), **{field: Sum(field) for field in ROLLUP_SUM_FIELDS})
+        .order_by()
+    )
+
+    rollups = [
+        PayrollCostRollup(
+            department_id=group["department_id"],
+            work_location_id=group["work_location_id"],
+            pay_period=pay_period,
+            employee_count=group["employee_count"],
+            **{field: group[field] or 0 for field in ROLLUP_SUM_FIELDS},
+        )
+        for group in groups
+    ]
+
+    with transaction.atomic():
+        PayrollCostRollup.objects.filter(pay_period=pay_period).delete()
+        PayrollCostRollup.objects.bulk_create(rollups)
+    return len(rollups)
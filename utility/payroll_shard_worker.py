@@ -0,0 +1,19 @@
+# ===============================================================
+# SHARDED PAYROLL RUN WORKER
+# ===============================================================
+# Entry points of the shard worker processes. A spawned worker unpickles
+# these functions before Django is set up, so this module must not import
+# any model at module level: the shard code is imported once the app
+# registry is ready.
+import django
+from django.db import connections
+
+def init_worker():
+    # the worker starts a fresh interpreter and opens its own connections
+    # instead of sharing the sockets of the parent process
+    django.setup()
+    connections.close_all()
+
+def run_shard(run_id, shard_by: str, shard_key, chunk_size: int):
+    from utility.payroll_shards import compute_shard
+    return compute_shard(run_id, shard_by, shard_key, chunk_size)
@@ -0,0 +1,188 @@
+# ===============================================================
+# SHARDED PAYROLL RUN
+# ===============================================================
+# Parallel payroll runs: the active employees are split into shards by
+# department or branch and every shard is computed and written by a
+# worker process with its own database connection, so a run uses every
+# core instead of one. The per shard results are merged in shard key
+# order, which keeps the totals identical from one execution to the next
+# whatever order the shards finish in.
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from emp_payroll.models import PayrollRun
+from utility.payroll import get_pay_period, load_rule_set
+from utility.payroll_engine import (
+    PAYROLL_CHUNK_SIZE, build_chunk, count_queries, empty_totals, get_payroll_employees, write_payrolls,
+)
+from utility.payroll_lock import payroll_period_lock
+from utility.payroll_shard_worker import init_worker, run_shard
+from utility.payroll_rollup import refresh_cost_rollups
+
+# number of worker processes of a sharded run
+PAYROLL_SHARD_WORKERS = getattr(settings, "PAYROLL_SHARD_WORKERS", os.cpu_count() or 1)
+
+# employee fields a run can be sharded by
+SHARD_FIELDS = {"department": "department_id", "work_location": "work_location_id"}
+
+# ===============================
+# SHARD
+# ===============================
+def compute_shard(run_id, shard_by: str, shard_key, chunk_size: int = PAYROLL_CHUNK_SIZE):
+    """
+    Compute and write the payrolls of one shard of a run, called in a
+    worker process through payroll_shard_worker.run_shard.
+
+    Each chunk is written in its own transaction and added to the progress
+    counters of the run.
+
+    Returns:
+        dict: The shard key, its counts, errors, totals and query count.
+    """
+    run = PayrollRun.objects.get(id=run_id)
+    result = {
+        "shard": shard_key, "employees": 0, "skipped": 0, "recomputed": 0, "written": 0, "unchanged": 0,
+        "errors": [], "totals": empty_totals(),
+    }
+    try:
+        with count_queries() as counter:
+            rules = load_rule_set()
+            employees = get_payroll_employees().filter(**{SHARD_FIELDS[shard_by]: shard_key}).order_by("id")
+
+            last_id = None
+            while True:
+                chunk_query = employees.filter(id__gt=last_id) if last_id else employees
+                chunk = list(chunk_query[:chunk_size])
+                if not chunk:
+                    break
+                last_id = chunk[-1].id
+
+                # the shard totals only take the chunk once it is committed
+                chunk_totals = dict(result["totals"])
+                payrolls, errors, skipped = build_chunk(chunk, run.payment_date, rules, chunk_totals, run.incremental)
+                with transaction.atomic():
+                    changed, unchanged = write_payrolls(payrolls)
+                    PayrollRun.objects.filter(id=run.id).update(
+                        processed_employees=F("processed_employees") + len(chunk),
+                        skipped_employees=F("skipped_employees") + skipped,
+                        recomputed_employees=F("recomputed_employees") + len(payrolls),
+                        written_payrolls=F("written_payrolls") + len(changed),
+                        unchanged_payrolls=F("unchanged_payrolls") + unchanged,
+                        updated_at=timezone.now(),
+                    )
+                result["totals"] = chunk_totals
+                result["employees"] += len(chunk)
+                result["skipped"] += skipped
+                result["recomputed"] += len(payrolls)
+                result["written"] += len(changed)
+                result["unchanged"] += unchanged
+                result["errors"].extend(errors)
+        result["query_count"] = counter["queries"]
+        return result
+    finally:
+        connections.close_all()
+
+# ===============================
+# MERGE
+# ===============================
+def get_shard_keys(shard_by: str):
+    keys = get_payroll_employees().order_by().values_list(SHARD_FIELDS[shard_by], flat=True).distinct()
+    return sorted(keys, key=shard_sort_key)
+
+def shard_sort_key(key):
+    # employees without a department or branch form the first shard
+    return "" if key is None else str(key)
+
+def merge_shard_results(results: list[dict]):
+    """
+    Merge the shard results in shard key order.
+
+    The shard totals are added with fsum, which is exact and does not depend
+    on the order the shards finished in, and the errors are listed shard by
+    shard, so merging the same shards always gives the same result.
+    """
+    results = sorted(results, key=lambda result: shard_sort_key(result["shard"]))
+    return {
+        "totals": {key: math.fsum(result["totals"][key] for result in results) for key in empty_totals()},
+        "errors": [error for result in results for error in result["errors"]],
+        "query_count": sum(result["query_count"] for result in results),
+    }
+
+# ===============================
+# RUN
+# ===============================
+def execute_sharded_run(run_id, workers: int = PAYROLL_SHARD_WORKERS, chunk_size: int = PAYROLL_CHUNK_SIZE):
+    """
+    Execute a payroll run with one worker process per shard.
+
+    The coordinating process holds the pay period lock while the workers
+    write. Shards are not checkpointed: a resumed sharded run executes
+    every shard again, and payrolls that are already written are compared
+    and left unchanged by the upsert.
+
+    Args:
+        run_id: The id of the PayrollRun to execute, its shard_by field
+            selects the shard key.
+        workers: The number of worker processes.
+        chunk_size: The number of employees computed and written per chunk.
+    """
+    run = PayrollRun.objects.get(id=run_id)
+    PayrollRun.objects.filter(id=run.id).update(
+        status="running",
+        started_at=run.started_at or timezone.now(),
+        finished_at=None,
+        processed_employees=0,
+        skipped_employees=0,
+        recomputed_employees=0,
+        written_payrolls=0,
+        unchanged_payrolls=0,
+        updated_at=timezone.now(),
+    )
+
+    try:
+        with payroll_period_lock(run.pay_period, str(run.id)):
+            with count_queries() as counter:
+                PayrollRun.objects.filter(id=run.id).update(total_employees=get_payroll_employees().count())
+                shard_keys = get_shard_keys(run.shard_by)
+
+                context = multiprocessing.get_context("spawn")
+                with ProcessPoolExecutor(
+                    max_workers=max(1, min(workers, len(shard_keys))),
+                    mp_context=context,
+                    initializer=init_worker,
+                ) as executor:
+                    futures = [executor.submit(run_shard, run.id, run.shard_by, key, chunk_size) for key in shard_keys]
+                    results, failures = [], []
+                    for key, future in zip(shard_keys, futures):
+                        try:
+                            results.append(future.result())
+                        except Exception as e:
+                            failures.append({"employee_id": None, "message": f"Shard {key}: {e}"})
+
+                merged = merge_shard_results(results)
+                refresh_cost_rollups(get_pay_period(run.payment_date))
+
+        errors = run.errors + merged["errors"] + failures
+        PayrollRun.objects.filter(id=run.id).update(
+            status="failed" if failures else "completed",
+            errors=errors,
+            totals=merged["totals"],
+            query_count=F("query_count") + counter["queries"] + merged["query_count"],
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+    except Exception as e:
+        run.errors.append({"employee_id": None, "message": str(e)})
+        PayrollRun.objects.filter(id=run.id).update(
+            status="failed",
+            errors=run.errors,
+            finished_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
@@ -0,0 +1,139 @@
+# ===============================================================
+# PAYROLL SIMULATION
+# ===============================================================
+# What-if payroll calculations: the workforce is computed twice with the
+# vectorized calculator, once with the current (cached) rules and once with
+# the requested overrides, and nothing is written to the database.
+import copy
+
+import numpy as np
+
+from deduction.models import Deduction
+from employees.models import Employee
+from utility.payroll import load_rule_set, compile_tax_brackets
+from utility.payroll_vector import load_workforce, compute_workforce
+
+# ===============================
+# OVERRIDES
+# ===============================
+def apply_rule_overrides(rules: dict, pension_percentage: float = None, allowance_overrides: list[dict] = None):
+    """
+    Copy a rule set with the simulated pension and allowance values.
+
+    The cached rule objects are never modified, overridden rules are copies.
+
+    Args:
+        rules: The rule set returned by load_rule_set.
+        pension_percentage: The simulated pension percentage.
+        allowance_overrides: Dicts with the 'id' of an allowance and its
+            simulated 'percentage' and/or 'amount'.
+
+    Returns:
+        dict: The simulated rule set.
+    """
+    simulated = dict(rules)
+
+    if pension_percentage is not None:
+        simulated["pension"] = Deduction(type="Pension", data=[{"percentage": pension_percentage}])
+
+    if allowance_overrides:
+        simulated["allowance"] = dict(rules["allowance"])
+        for override in allowance_overrides:
+            allowance_id = str(override["id"])
+            if allowance_id not in simulated["allowance"]:
+                raise ValueError(f"Allowance {allowance_id} not found or inactive")
+            allowance = copy.copy(simulated["allowance"][allowance_id])
+            if override.get("percentage") is not None:
+                allowance.percentage = override["percentage"]
+            if override.get("amount") is not None:
+                allowance.amount = override["amount"]
+            simulated["allowance"][allowance_id] = allowance
+
+    return simulated
+
+def get_simulation_employees(employee_ids: list = None, department_ids: list = None, work_location_ids: list = None):
+    employees = Employee.objects.filter(is_deleted=False, is_active=True)
+    if employee_ids:
+        employees = employees.filter(id__in=employee_ids)
+    if department_ids:
+        employees = employees.filter(department_id__in=department_ids)
+    if work_location_ids:
+        employees = employees.filter(work_location_id__in=work_location_ids)
+    return employees
+
+# ===============================
+# SIMULATION
+# ===============================
+def summarize(salary: np.ndarray, result: dict):
+    return {
+        "basic_salary": round(float(salary.sum()), 2),
+        "allowance": round(float(result["allowance_total"].sum()), 2),
+        "gross": round(float((salary + result["allowance_total"]).sum()), 2),
+        "tax": round(float(result["tax"].sum()), 2),
+        "pension": round(float(result["pension"].sum()), 2),
+        "deduction": round(float(result["deduction_total"].sum()), 2),
+        "net": round(float(result["net"].sum()), 2),
+    }
+
+def simulate_payroll(
+    salary_increase_percentage: float = 0,
+    employee_ids: list = None,
+    department_ids: list = None,
+    work_location_ids: list = None,
+    tax_brackets: list[dict] = None,
+    pension_percentage: float = None,
+    allowance_overrides: list[dict] = None,
+    details: bool = False,
+):
+    """
+    Simulate a payroll run without writing anything.
+
+    Args:
+        salary_increase_percentage: Raise applied to the basic salary of the
+            simulated employees.
+        employee_ids, department_ids, work_location_ids: Restrict the
+            simulation to a subset of the active employees.
+        tax_brackets: Tax bracket list replacing the current Tax data.
+        pension_percentage: Pension percentage replacing the current one.
+        allowance_overrides: Simulated allowance percentages/amounts.
+        details: Include the per employee deltas.
+
+    Returns:
+        dict: 'employees', aggregate 'baseline', 'simulated' and 'delta'
+        totals and, with details, the per employee 'details'.
+    """
+    rules = load_rule_set()
+    simulated_rules = apply_rule_overrides(rules, pension_percentage, allowance_overrides)
+    tax_table = compile_tax_brackets(tax_brackets) if tax_brackets is not None else None
+
+    workforce = load_workforce(get_simulation_employees(employee_ids, department_ids, work_location_ids))
+    simulated_workforce = dict(workforce, salary=workforce["salary"] * (1 + salary_increase_percentage / 100))
+
+    baseline = compute_workforce(workforce, rules)
+    simulated = compute_workforce(simulated_workforce, simulated_rules, tax_table)
+
+    baseline_totals = summarize(workforce["salary"], baseline)
+    simulated_totals = summarize(simulated_workforce["salary"], simulated)
+    result = {
+        "employees": len(workforce["ids"]),
+        "baseline": baseline_totals,
+        "simulated": simulated_totals,
+        "delta": {key: round(simulated_totals[key] - baseline_totals[key], 2) for key in baseline_totals},
+        "details": [],
+    }
+
+    if details:
+        baseline_gross = workforce["salary"] + baseline["allowance_total"]
+        simulated_gross = simulated_workforce["salary"] + simulated["allowance_total"]
+        for row, employee_id in enumerate(workforce["ids"]):
+            result["details"].append({
+                "employee_id": employee_id,
+                "baseline_gross": round(float(baseline_gross[row]), 2),
+                "simulated_gross": round(float(simulated_gross[row]), 2),
+                "baseline_net": round(float(baseline["net"][row]), 2),
+                "simulated_net": round(float(simulated["net"][row]), 2),
+                "gross_delta": round(float(simulated_gross[row] - baseline_gross[row]), 2),
+                "net_delta": round(float(simulated["net"][row] - baseline["net"][row]), 2),
+            })
+
+    return result
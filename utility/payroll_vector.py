@@ -0,0 +1,195 @@
+# ===============================================================
+# VECTORIZED PAYROLL UTILS
+# ===============================================================
+# Whole-workforce payroll totals computed as NumPy array operations.
+# Every formula follows the scalar path in utility/payroll.py operation by
+# operation (same operands, same order of additions) so both paths produce
+# bit-for-bit identical floats, see reconcile_with_scalar.
+import numpy as np
+
+from employees.models import Employee
+from utility.payroll import compute_allowances, compute_deductions, get_net_salary, get_tax_table
+
+# ===============================
+# WORKFORCE
+# ===============================
+def load_workforce(employees=None):
+    """
+    Load the payroll inputs of the active employees in one query.
+
+    Args:
+        employees: Optional employee queryset, defaults to every active employee.
+
+    Returns:
+        dict: 'ids', 'salary' (float64 array), 'allowance' and 'deduction'
+        (the assigned ID lists of each employee).
+    """
+    if employees is None:
+        employees = Employee.objects.filter(is_deleted=False, is_active=True)
+
+    ids, salaries, allowances, deductions = [], [], [], []
+    for employee_id, basic_salary, allowance, deduction in employees.values_list("id", "basic_salary", "allowance", "deduction").iterator(chunk_size=5000):
+        ids.append(employee_id)
+        salaries.append(float(basic_salary))
+        allowances.append(allowance or [])
+        deductions.append(deduction or [])
+
+    return {
+        "ids": ids,
+        "salary": np.array(salaries, dtype=np.float64),
+        "allowance": allowances,
+        "deduction": deductions,
+    }
+
+# ===============================
+# ASSIGNMENT MATRICES
+# ===============================
+def build_rate_matrices(assignments: list[list], catalog: dict):
+    """
+    Turn per employee rule ID lists into padded (employees x slots) matrices.
+
+    Slots keep the assignment order of each employee, rules missing from the
+    catalog are left empty like the scalar path skips them.
+
+    Args:
+        assignments: The assigned rule IDs of each employee.
+        catalog: Rule ID -> (type, percentage, amount).
+
+    Returns:
+        tuple: (is_fixed, is_percentage, percentage, amount) matrices.
+    """
+    width = max((len(ids) for ids in assignments), default=0)
+    shape = (len(assignments), width)
+    is_fixed = np.zeros(shape, dtype=bool)
+    is_percentage = np.zeros(shape, dtype=bool)
+    percentage = np.zeros(shape, dtype=np.float64)
+    amount = np.zeros(shape, dtype=np.float64)
+
+    for row, ids in enumerate(assignments):
+        slot = 0
+        for rule_id in ids:
+            rule = catalog.get(str(rule_id))
+            if rule is None:
+                continue
+            rule_type, rule_percentage, rule_amount = rule
+            if rule_type == "fixed":
+                is_fixed[row, slot] = True
+                amount[row, slot] = rule_amount
+            elif rule_type == "percentage":
+                is_percentage[row, slot] = True
+                percentage[row, slot] = rule_percentage
+            slot += 1
+
+    return is_fixed, is_percentage, percentage, amount
+
+def accumulate_slots(total: np.ndarray, salary: np.ndarray, matrices: tuple):
+    is_fixed, is_percentage, percentage, amount = matrices
+    for slot in range(is_fixed.shape[1]):
+        fixed = np.where(is_fixed[:, slot], amount[:, slot], 0.0)
+        percent = np.where(is_percentage[:, slot], (salary * percentage[:, slot]) / 100, 0.0)
+        total = total + fixed + percent
+    return total
+
+def allowance_catalog(rules: dict):
+    return {
+        rule_id: (a.type, float(a.percentage or 0), float(a.amount or 0))
+        for rule_id, a in rules["allowance"].items()
+    }
+
+def other_deduction_catalog(rules: dict):
+    return {
+        rule_id: (d["type"], float(d["percentage"]), float(d["amount"]))
+        for rule_id, d in rules["other"].items()
+    }
+
+# ===============================
+# TAX
+# ===============================
+def compute_tax(salary: np.ndarray, table: dict):
+    lower = np.frombuffer(table["lower"], dtype=np.float64)
+    upper = np.frombuffer(table["upper"], dtype=np.float64)
+    if not len(lower):
+        return np.zeros_like(salary)
+
+    rate = np.array([float(b["rate"]) for b in table["brackets"]], dtype=np.float64)
+    deduction = np.array([float(b["deduction"]) for b in table["brackets"]], dtype=np.float64)
+
+    index = np.searchsorted(lower, salary, side="right") - 1
+    # a salary sitting on a shared bound belongs to the lower bracket
+    previous = np.clip(index - 1, 0, None)
+    on_bound = (index > 0) & (salary == lower[np.clip(index, 0, None)]) & (salary <= upper[previous])
+    index = np.where(on_bound, index - 1, index)
+
+    found = index >= 0
+    index = np.clip(index, 0, None)
+    found &= salary <= upper[index]
+    return np.where(found, (salary * rate[index]) / 100 - deduction[index], 0.0)
+
+# ===============================
+# WORKFORCE PAYROLL
+# ===============================
+def compute_workforce(workforce: dict, rules: dict, tax_table: dict = None):
+    """
+    Compute the payroll totals of a whole workforce as array operations.
+
+    Args:
+        workforce: The workforce returned by load_workforce.
+        rules: The rule set returned by load_rule_set.
+        tax_table: A compiled tax table replacing the one of the Tax rule.
+
+    Returns:
+        dict: float64 arrays 'tax', 'pension', 'allowance_total',
+        'deduction_total' and 'net', aligned with workforce['ids'].
+    """
+    salary = workforce["salary"]
+
+    tax = compute_tax(salary, tax_table or get_tax_table(rules["tax"]))
+    if rules["pension"].data:
+        pension = (salary * float(rules["pension"].data[0]["percentage"])) / 100
+    else:
+        pension = np.zeros_like(salary)
+
+    deduction_total = accumulate_slots(tax + pension, salary, build_rate_matrices(workforce["deduction"], other_deduction_catalog(rules)))
+    allowance_total = accumulate_slots(np.zeros_like(salary), salary, build_rate_matrices(workforce["allowance"], allowance_catalog(rules)))
+
+    return {
+        "tax": tax,
+        "pension": pension,
+        "allowance_total": allowance_total,
+        "deduction_total": deduction_total,
+        "net": salary + allowance_total - deduction_total,
+    }
+
+# ===============================
+# RECONCILIATION
+# ===============================
+def reconcile_with_scalar(workforce: dict, result: dict, rules: dict):
+    """
+    Compare the vectorized totals with the scalar path bit for bit.
+
+    Returns:
+        list: One dict per employee whose totals differ, empty when the two
+        paths agree.
+    """
+    mismatches = []
+    for row, employee_id in enumerate(workforce["ids"]):
+        salary = workforce["salary"][row]
+        all_allowance = compute_allowances(workforce["allowance"][row], salary, rules)
+        all_deduction = compute_deductions(workforce["deduction"][row], salary, rules)
+        scalar = np.array([
+            all_allowance["TOTAL"],
+            all_deduction["TOTAL"],
+            get_net_salary(salary, all_allowance, all_deduction),
+        ], dtype=np.float64)
+        vector = np.array([
+            result["allowance_total"][row],
+            result["deduction_total"][row],
+            result["net"][row],
+        ], dtype=np.float64)
+        if not np.array_equal(scalar.view(np.uint64), vector.view(np.uint64)):
+            mismatches.append({
+                "employee_id": str(employee_id),
+                "scalar": scalar.tolist(),
+                "vector": vector.tolist(),
+            })
+    return mismatches
@@ -0,0 +1,106 @@
+# ===============================================================
+# COMPENSATION RULE CACHE
+# ===============================================================
+# In-process cache of the Deduction (Tax, Pension, Other) and Allowance
+# rows. Lookups are plain dict reads; the cache is dropped by the model
+# save/delete signals of this worker (see deduction/siginal.py and
+# allowance/signals.py) and a cheap version check, run at most every
+# RULE_CACHE_CHECK_INTERVAL seconds, picks up changes made by other
+# gunicorn workers.
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from allowance.models import Allowance
+from deduction.models import Deduction
+
+# seconds between two version checks against the database
+RULE_CACHE_CHECK_INTERVAL = getattr(settings, "RULE_CACHE_CHECK_INTERVAL", 5)
+
+_lock = threading.Lock()
+_cache = {"rules": None, "version": None, "checked_at": 0.0}
+
+# ===============================
+# VERSION
+# ===============================
+def get_rule_version():
+    """
+    Version of the rule tables: the latest updated_at and the row count of
+    each table, so both edits and hard deletes change it.
+    """
+    deductions = Deduction.objects.aggregate(updated_at=Max("updated_at"), count=Count("id"))
+    allowances = Allowance.objects.aggregate(updated_at=Max("updated_at"), count=Count("id"))
+    return (deductions["updated_at"], deductions["count"], allowances["updated_at"], allowances["count"])
+
+# ===============================
+# LOADING
+# ===============================
+def load_rules():
+    deductions = {}
+    for deduction in Deduction.objects.order_by("-created_at"):
+        deductions.setdefault(deduction.type, []).append(deduction)
+
+    allowances = {str(a.id): a for a in Allowance.objects.filter(is_deleted=False).order_by("-created_at")}
+
+    def first_active(deduction_type):
+        return next((d for d in deductions.get(deduction_type, []) if d.is_active), None)
+
+    other_deduction = first_active("Other")
+    latest_other = next(iter(deductions.get("Other", [])), None)
+    return {
+        # every Deduction row by type, newest first
+        "deductions": deductions,
+        # every Allowance that is not deleted, by id
+        "allowances": allowances,
+        # position of every allowance in the model order, to sort a lookup by id
+        "allowance_positions": {allowance_id: position for position, allowance_id in enumerate(allowances)},
+        # the rows of the newest Other deduction by id, with their position in its data
+        "other_deductions": {str(d["id"]): (position, d) for position, d in enumerate(latest_other.data)} if latest_other else {},
+        # the active rules a payroll is computed from
+        "rule_set": {
+            "tax": first_active("Tax"),
+            "pension": first_active("Pension"),
+            "other_updated_at": other_deduction.updated_at if other_deduction else None,
+            "other": {str(d["id"]): d for d in other_deduction.data} if other_deduction else {},
+            "allowance": {allowance_id: a for allowance_id, a in allowances.items() if a.is_active},
+        },
+    }
+
+def get_rules():
+    """
+    Get the cached compensation rules, loading them when the cache is cold,
+    was invalidated or the rule tables changed since the last version check.
+    """
+    now = time.monotonic()
+    with _lock:
+        if _cache["rules"] is not None and now - _cache["checked_at"] < RULE_CACHE_CHECK_INTERVAL:
+            return _cache["rules"]
+
+        version = get_rule_version()
+        if _cache["rules"] is None or version != _cache["version"]:
+            _cache["rules"] = load_rules()
+            _cache["version"] = version
+        _cache["checked_at"] = now
+        return _cache["rules"]
+
+def invalidate_rule_cache(**kwargs):
+    with _lock:
+        _cache["rules"] = None
+        _cache["version"] = None
+
+# ===============================
+# LOOKUPS
+# ===============================
+def get_cached_deduction(deduction_type: str, active_only: bool = False):
+    for deduction in get_rules()["deductions"].get(deduction_type, []):
+        if deduction.is_active or not active_only:
+            return deduction
+    return None
+
+def get_cached_allowance(allowance_id, active_only: bool = False):
+    allowance = get_rules()["allowances"].get(str(allowance_id))
+    if allowance is None or (active_only and not allowance.is_active):
+        return None
+    return allowance
@@ -0,0 +1,40 @@
+# ===============================================================
+# STREAMING UTILS
+# ===============================================================
+from django.http import StreamingHttpResponse
+
+# rows fetched per round trip while streaming a queryset
+STREAM_CHUNK_SIZE = 2000
+
+# supported values of the 'stream' query parameter
+STREAM_FORMATS = ["ndjson"]
+
+# file-like object whose write returns the value, lets csv.writer produce
+# the lines of a streamed response
+class Echo:
+    def write(self, value):
+        return value
+
+# ===============================
+# NDJSON STREAMING
+# ===============================
+def stream_ndjson(queryset, serializer, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Stream a queryset as newline delimited JSON, one serialized row per line.
+
+    The queryset is read with .iterator() so only one chunk of rows is held
+    in memory at a time, whatever the size of the table.
+
+    Args:
+        queryset: The queryset to stream.
+        serializer: Function turning a row into a ninja Schema.
+        chunk_size: The number of rows fetched per round trip.
+
+    Returns:
+        StreamingHttpResponse: The application/x-ndjson response.
+    """
+    def rows():
+        for obj in queryset.iterator(chunk_size=chunk_size):
+            yield serializer(obj).model_dump_json() + "\n"
+
+    return StreamingHttpResponse(rows(), content_type="application/x-ndjson")